@@ -0,0 +1,38 @@
+import csv
+import io
+from itertools import islice
+
+from django.db import connection
+
+COPY_BATCH_SIZE = 50000
+
+
+def copy_rows(model, fields, rows, batch_size=COPY_BATCH_SIZE):
+    """
+    Вставляет строки в таблицу модели пачками по batch_size, минуя ORM:
+    COPY на PostgreSQL, executemany на остальных СУБД. fields — имена
+    столбцов модели (attname), rows — любой итерируемый объект.
+    Возвращает число вставленных строк.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(
+        quote(model._meta.get_field(field).column) for field in fields)
+    rows = iter(rows)
+    total = 0
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            if connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                    buffer)
+            else:
+                placeholders = ', '.join(['%s'] * len(fields))
+                cursor.executemany(
+                    f'INSERT INTO {table} ({columns}) '
+                    f'VALUES ({placeholders})', batch)
+            total += len(batch)
+    return total
@@ -0,0 +1,117 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.response import Response
+
+from .utils import is_personal
+
+RECIPES = 'recipes'
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+USERS = 'users'
+
+
+def version_key(tag):
+    return f'api:version:{tag}'
+
+
+def get_versions(tags):
+    """Текущие версии тегов кеша одним запросом к кешу."""
+    keys = [version_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    return [versions.get(key) for key in keys]
+
+
+def invalidate(*tags):
+    """
+    Меняет версии тегов: все ответы, зависящие от них, устаревают.
+    Версии меняются после фиксации транзакции: иначе параллельный
+    запрос успел бы закешировать старые данные под новой версией.
+    """
+    transaction.on_commit(lambda: cache.set_many(
+        {version_key(tag): uuid.uuid4().hex for tag in tags}, timeout=None))
+
+
+def normalize_query_params(query_params):
+    """Параметры запроса без пустых значений и без учёта порядка."""
+    return sorted(
+        (key, sorted(value for value in query_params.getlist(key) if value))
+        for key in query_params
+        if any(query_params.getlist(key))
+    )
+
+
+def response_cache_key(request, view, tags):
+    raw = repr((
+        request.scheme,
+        request.get_host(),
+        view.basename,
+        view.action,
+        sorted(view.kwargs.items()),
+        normalize_query_params(request.query_params),
+        get_versions(tags),
+    ))
+    digest = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+    return f'api:response:{digest}'
+
+
+class AnonymousCacheMixin:
+    """
+    Кеширует ответы list/retrieve без персональных данных: для анонимов
+    и для запросов с personal=false без фильтров из user_filters.
+    Такие ответы одинаковы для всех, поэтому ключ строится только
+    из параметров запроса и версий тегов cache_tags, которые
+    сбрасываются сигналами при изменении данных.
+    """
+
+    cache_tags = ()
+    surrogate_keys = ()
+    # Фильтры по данным текущего пользователя: с ними ответ личный
+    # даже при personal=false
+    user_filters = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def get_surrogate_keys(self, data):
+        """Ключи, по которым шлюз сможет сбросить этот ответ."""
+        return list(self.surrogate_keys)
+
+    def uses_user_filters(self, request):
+        return any(
+            request.query_params.get(name) for name in self.user_filters)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.method != 'GET':
+            return handler(request, *args, **kwargs)
+        if request.user.is_authenticated and (
+                is_personal(request) or self.uses_user_filters(request)):
+            response = handler(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Authorization',))
+            return response
+
+        key = response_cache_key(request, self, self.cache_tags)
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+
+        patch_cache_control(
+            response, public=True, max_age=settings.API_CACHE_MAX_AGE)
+        patch_vary_headers(response, ('Authorization',))
+        response.headers['Surrogate-Key'] = ' '.join(
+            self.get_surrogate_keys(response.data))
+        return response
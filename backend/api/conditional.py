@@ -0,0 +1,115 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, F, OuterRef
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from carts.models import ShoppingCart
+from recipes.models import Recipe
+from users.models import Follow
+
+RECIPE_VALIDATOR_FIELDS = (
+    'id', 'updated', 'author__email', 'author__username',
+    'author__first_name', 'author__last_name', 'author__avatar',
+)
+USER_VALIDATOR_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'avatar',
+)
+
+
+def make_etag(rows, viewer=None):
+    """
+    Строит ETag по строкам валидатора. viewer передаётся, если ответ
+    содержит персональные данные пользователя.
+    """
+    digest = hashlib.md5(usedforsecurity=False)
+    digest.update(repr((viewer and viewer.pk, list(rows))).encode())
+    return quote_etag(digest.hexdigest())
+
+
+def first_row(queryset):
+    """Первая строка валидатора или None, как get_object_or_404 у DRF."""
+    try:
+        return queryset.first()
+    except (TypeError, ValueError, ValidationError):
+        return None
+
+
+def get_viewer(request, personal=True):
+    """Пользователь, для которого ответ персонален, или None."""
+    if personal and request.user.is_authenticated:
+        return request.user
+    return None
+
+
+def recipe_validators(user):
+    """
+    Выражения, от которых зависит представление рецептов: дата
+    изменения, публичные поля автора и, если передан пользователь,
+    его флаги. Имена — validator_<поле>.
+    """
+    validators = {
+        'validator_' + name.replace('__', '_'): F(name)
+        for name in RECIPE_VALIDATOR_FIELDS
+    }
+    if user is not None:
+        validators.update(
+            validator_favorited=Exists(
+                Recipe.favorites.through.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+            validator_in_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            validator_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+    return validators
+
+
+def recipe_validator_rows(queryset, user):
+    validators = recipe_validators(user)
+    return queryset.annotate(**validators).values_list(*validators)
+
+
+def validator_row(recipe, validators):
+    """Строка валидатора из рецепта, прочитанного с recipe_validators."""
+    return tuple(getattr(recipe, name) for name in validators)
+
+
+def user_validator_rows(queryset, user):
+    """Публичные поля пользователя и признак подписки на него."""
+    fields = USER_VALIDATOR_FIELDS
+    if user is not None:
+        queryset = queryset.annotate(viewer_subscribed=Exists(
+            Follow.objects.filter(user=user, author=OuterRef('pk'))))
+        fields += ('viewer_subscribed',)
+    return queryset.values_list(*fields)
+
+
+class ConditionalGetMixin:
+    """
+    Отвечает 304 на If-None-Match/If-Modified-Since до того, как
+    отработают сериализаторы. Наследник возвращает из get_validators()
+    пару (etag, last_modified) или None, если проверка не применима.
+    """
+
+    def get_validators(self, request, *args, **kwargs):
+        return None
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        etag, last_modified = validators
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response.headers['ETag'] = etag
+        if timestamp is not None:
+            response.headers['Last-Modified'] = http_date(timestamp)
+        return response
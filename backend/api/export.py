@@ -0,0 +1,29 @@
+from recipes.models import Recipe
+from .renderers import FastJSONRenderer
+from .serializers import FastRecipeSerializer
+
+
+def export_recipes(request=None, after=0, chunk_size=500):
+    """
+    Генератор NDJSON со всеми рецептами, у которых id больше after,
+    по рецепту в строке и в порядке id. Рецепты читаются серверным
+    курсором по chunk_size строк, связи каждой пачки — тремя запросами
+    FastRecipeSerializer, поэтому память не зависит от размера каталога.
+    """
+    renderer = FastJSONRenderer()
+    context = {'request': request, 'personal': False}
+    batch = []
+    recipes = Recipe.objects.filter(id__gt=after).order_by('id')
+    for recipe in recipes.iterator(chunk_size=chunk_size):
+        batch.append(recipe)
+        if len(batch) < chunk_size:
+            continue
+        yield render_lines(renderer, batch, context)
+        batch = []
+    if batch:
+        yield render_lines(renderer, batch, context)
+
+
+def render_lines(renderer, recipes, context):
+    data = FastRecipeSerializer(recipes, many=True, context=context).data
+    return b''.join(renderer.render(item) + b'\n' for item in data)
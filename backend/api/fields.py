@@ -0,0 +1,80 @@
+from collections.abc import Mapping
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который может заранее получить все объекты
+    одним запросом id__in вместо отдельного запроса на каждый ключ.
+    Сообщения об ошибках совпадают с PrimaryKeyRelatedField.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.resolved = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        if isinstance(data, bool):
+            raise TypeError
+        return self.get_queryset().model._meta.pk.to_python(data)
+
+    def resolve(self, values):
+        """Загружает объекты для всех переданных ключей одним запросом."""
+        pks = set()
+        for value in values:
+            if value is None:
+                continue
+            try:
+                pks.add(self.to_pk(value))
+            except (TypeError, ValueError, DjangoValidationError):
+                # Некорректный ключ получит ошибку при валидации элемента
+                continue
+        self.resolved = self.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        if self.resolved is None:
+            return super().to_internal_value(data)
+        try:
+            pk = self.to_pk(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.resolved:
+            self.fail('does_not_exist', pk_value=data)
+        return self.resolved[pk]
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    """Список первичных ключей, разрешаемый одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, (list, tuple)):
+            self.child_relation.resolve(data)
+        return super().to_internal_value(data)
+
+
+class BulkRelatedListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer, который перед валидацией элементов разрешает
+    все BulkPrimaryKeyRelatedField дочернего сериализатора разом.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            for field in self.child.fields.values():
+                if isinstance(field, BulkPrimaryKeyRelatedField):
+                    field.resolve(
+                        item.get(field.field_name) for item in data
+                        if isinstance(item, Mapping)
+                    )
+        return super().to_internal_value(data)
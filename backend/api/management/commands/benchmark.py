@@ -0,0 +1,219 @@
+import base64
+import io
+import json
+import os
+import statistics
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.db.models import Prefetch
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.filters import RecipeFilter
+from api.serializers import (CreateUpdateDeleteRecipeSerializer,
+                             ListRetrieveRecipeSerializer)
+from api.stats import write_report
+from api.utils import decode_base64_image, generate_shopping_cart_report
+from carts.models import ShoppingCart
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from shortener.views import create_short_link
+
+User = get_user_model()
+
+PAGE_SIZES = (6, 20, 100)
+CART_SIZE = 20
+CART_FORMATS = ('txt', 'pdf', 'csv')
+IMAGE_SIDES = (64, 256, 1024)
+INGREDIENT_COUNTS = (10, 50, 200)
+
+
+def image_data_url(side):
+    """PNG из шума: плохо сжимается, размер растёт с площадью."""
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+class Command(BaseCommand):
+    help = ('Микробенчмарки горячих функций: сериализация страниц '
+            'рецептов, отчёт корзины, декодирование изображений, '
+            'короткие ссылки, RecipeFilter и валидация рецепта. '
+            'Результаты сохраняются в JSON и сравниваются с базовыми.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Серий замеров на бенчмарк.')
+        parser.add_argument('--filter', default='',
+                            help='Запускать только бенчмарки, в имени '
+                                 'которых есть эта подстрока.')
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+        parser.add_argument('--baseline',
+                            help='JSON предыдущего запуска для сравнения.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимое замедление относительно '
+                                 'базового запуска, доля.')
+
+    def handle(self, *args, **options):
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)['benchmarks']
+
+        results = {}
+        # Бенчмарки пишут в базу (корзина, короткие ссылки): всё откатываем
+        with transaction.atomic():
+            for name, function in self.cases():
+                if options['filter'] not in name:
+                    continue
+                results[name] = self.measure(function, options['repeat'])
+                self.print_result(name, results[name], baseline.get(name))
+            transaction.set_rollback(True)
+
+        if options['output']:
+            write_report(options['output'], {
+                'repeat': options['repeat'],
+                'benchmarks': results,
+            })
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+        regressions = [
+            name for name, result in results.items()
+            if name in baseline and result['min_us'] > baseline[name][
+                'min_us'] * (1 + options['threshold'])
+        ]
+        if regressions:
+            raise CommandError(
+                f'Замедление больше {options["threshold"]:.0%}: '
+                f'{", ".join(regressions)}')
+
+    def measure(self, function, repeat):
+        """
+        Число вызовов в серии подбирается так, чтобы серия длилась
+        не меньше 0.2 с; в результат идут минимум и медиана по сериям.
+        Запросы к БД считаются на прогретом вызове.
+        """
+        function()
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        query_count = len(queries)
+        timer = timeit.Timer(function)
+        number, _ = timer.autorange()
+        timings = []
+        for _ in range(repeat):
+            timings.append(timer.timeit(number) / number)
+            # При DEBUG журнал запросов растёт и замедляет замеры
+            reset_queries()
+        return {
+            'min_us': round(min(timings) * 1e6, 2),
+            'median_us': round(statistics.median(timings) * 1e6, 2),
+            'number': number,
+            'queries': query_count,
+        }
+
+    def print_result(self, name, result, base):
+        line = (f'{name:<42}{result["min_us"]:>12.1f} мкс'
+                f'{result["median_us"]:>12.1f} мкс'
+                f'{result["queries"]:>5} запр.')
+        if base:
+            change = result['min_us'] / base['min_us'] - 1
+            line += f'{change:>+9.1%}'
+        self.stdout.write(line)
+
+    def make_request(self, user, method='get', path='/api/recipes/',
+                     data=None):
+        factory = APIRequestFactory()
+        if method == 'post':
+            request = Request(factory.post(path, data, format='json'))
+        else:
+            request = Request(factory.get(path, data))
+        request.user = user
+        return request
+
+    def cases(self):
+        """Пары (имя, функция без аргументов) для замера."""
+        user = User.objects.order_by('id').first()
+        recipe_ids = list(Recipe.objects.order_by('id').values_list(
+            'id', flat=True)[:max(PAGE_SIZES)])
+        if user is None or len(recipe_ids) < CART_SIZE:
+            raise CommandError('Мало данных: выполните generate_data.')
+        request = self.make_request(user)
+
+        queryset = Recipe.objects.order_by('id').select_related(
+            'author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch('recipe_ingredients',
+                     queryset=RecipeIngredient.objects.select_related(
+                         'ingredient').order_by('id')))
+        for size in PAGE_SIZES:
+            yield (f'list_serializer[{size}]',
+                   lambda size=size: ListRetrieveRecipeSerializer(
+                       queryset[:size], many=True,
+                       context={'request': request}).data)
+
+        ShoppingCart.objects.filter(user=user).delete()
+        ShoppingCart.objects.bulk_create([
+            ShoppingCart(user=user, recipe_id=recipe_id)
+            for recipe_id in recipe_ids[:CART_SIZE]
+        ])
+        for file_format in CART_FORMATS:
+            yield (f'shopping_cart_report[{file_format}]',
+                   lambda file_format=file_format:
+                   generate_shopping_cart_report(user, file_format))
+
+        for side in IMAGE_SIDES:
+            data = image_data_url(side)
+            yield (f'decode_base64_image[{len(data) // 1024}KB]',
+                   lambda data=data: decode_base64_image(data, 'recipes'))
+
+        yield ('create_short_link',
+               lambda: create_short_link(
+                   f'https://example.com/api/recipes/{recipe_ids[0]}/'))
+
+        tag_slugs = list(Tag.objects.values_list('slug', flat=True)[:2])
+        for title, query in (
+                ('tags', [('tags', slug) for slug in tag_slugs]),
+                ('is_favorited', [('is_favorited', '1')]),
+                ('author', [('author', str(user.id))])):
+            filter_request = self.make_request(user, data=query)
+            yield (f'recipe_filter[{title}]',
+                   lambda filter_request=filter_request: str(RecipeFilter(
+                       filter_request.query_params,
+                       queryset=Recipe.objects.all(),
+                       request=filter_request).qs.query))
+
+        ingredient_ids = list(Ingredient.objects.order_by('id').values_list(
+            'id', flat=True)[:max(INGREDIENT_COUNTS)])
+        tag_ids = list(Tag.objects.values_list('id', flat=True)[:2])
+        image = image_data_url(8)
+        for count in INGREDIENT_COUNTS:
+            payload = {
+                'name': 'Бенчмарк',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'image': image,
+                'tags': tag_ids,
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': 10}
+                    for ingredient_id in ingredient_ids[:count]
+                ],
+            }
+            post_request = self.make_request(user, 'post', data=payload)
+            yield (f'recipe_validation[{len(payload["ingredients"])}]',
+                   lambda payload=payload, post_request=post_request:
+                   self.validate_recipe(payload, post_request))
+
+    @staticmethod
+    def validate_recipe(payload, request):
+        serializer = CreateUpdateDeleteRecipeSerializer(
+            data=payload, context={'request': request})
+        if not serializer.is_valid():
+            raise CommandError(f'Рецепт не прошёл проверку: '
+                               f'{serializer.errors}')
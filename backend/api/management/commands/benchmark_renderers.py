@@ -0,0 +1,50 @@
+import gzip
+import timeit
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import FastJSONRenderer
+from api.serializers import ListRetrieveRecipeSerializer
+from recipes.models import Recipe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время рендеринга JSON и размер сжатых ответов '
+            'для страниц рецептов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[6, 20, 100],
+                            help='Количество рецептов на странице.')
+        parser.add_argument('--repeat', type=int, default=200,
+                            help='Число повторов рендеринга.')
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        renderers = [JSONRenderer(), FastJSONRenderer()]
+        for size in options['sizes']:
+            recipes = Recipe.objects.order_by('id')[:size]
+            data = ListRetrieveRecipeSerializer(
+                recipes, many=True, context={'request': request}).data
+            self.stdout.write(f'Рецептов на странице: {len(data)}')
+            for renderer in renderers:
+                seconds = timeit.timeit(
+                    lambda: renderer.render(data), number=options['repeat'])
+                self.stdout.write(
+                    f'  {type(renderer).__name__:<18}'
+                    f'{seconds / options["repeat"] * 1e6:10.1f} мкс')
+            content = renderers[-1].render(data)
+            self.stdout.write(f'  {"без сжатия":<18}{len(content):10} байт')
+            self.stdout.write(
+                f'  {"gzip":<18}{len(gzip.compress(content)):10} байт')
+            if brotli is not None:
+                compressed = brotli.compress(content, quality=4)
+                self.stdout.write(f'  {"brotli":<18}{len(compressed):10} байт')
@@ -0,0 +1,62 @@
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import FastRecipeSerializer, ListRetrieveRecipeSerializer
+from recipes.models import Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость FastRecipeSerializer и '
+            'ListRetrieveRecipeSerializer. Совпадение вывода проверяют '
+            'тесты api.tests.test_fast_serializer.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100,
+                            help='Количество рецептов.')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Число повторов сериализации.')
+        parser.add_argument('--user', help='Email пользователя-зрителя.')
+
+    def make_request(self, user, query):
+        request = Request(APIRequestFactory().get('/api/recipes/', query))
+        if user is not None:
+            request.user = user
+        return request
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError('Пользователь не найден.')
+        queryset = Recipe.objects.order_by('id')[:options['size']]
+        prefetched = queryset.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch('recipe_ingredients',
+                     queryset=RecipeIngredient.objects.select_related(
+                         'ingredient').order_by('id'))
+        )
+
+        for query in ({}, {'personal': 'false'},
+                      {'fields': 'name,image,cooking_time,author',
+                       'expand': 'author'},
+                      {'fields': 'tags,ingredients,author'}):
+            self.stdout.write(f'Параметры {query}:')
+            for name, serializer_class, recipes in (
+                    ('ModelSerializer', ListRetrieveRecipeSerializer,
+                     prefetched),
+                    ('FastRecipeSerializer', FastRecipeSerializer, queryset)):
+                context = {'request': self.make_request(user, query)}
+                seconds = timeit.timeit(
+                    lambda: serializer_class(
+                        recipes.all(), many=True, context=context).data,
+                    number=options['repeat'])
+                rate = len(queryset) * options['repeat'] / seconds
+                self.stdout.write(f'  {name:<22}{rate:12.0f} рецептов/с')
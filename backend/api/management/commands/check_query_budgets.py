@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api.queries import QueryBudgetExceeded, QueryRecorder
+from carts.models import ShoppingCart
+from recipes.models import Recipe, Tag
+from users.models import Follow
+
+User = get_user_model()
+
+FIXTURE_SIZE = 20
+DUMMY_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет основные эндпоинты через тестовый клиент в строгом '
+            'режиме детектора запросов: превышение бюджета @query_budget '
+            'или повторяющийся запрос (N+1) завершает команду ошибкой. '
+            'Данные для проверки создаются в откатываемой транзакции.')
+
+    def handle(self, *args, **options):
+        failures = []
+        # Кеш ответов выключен: считаем запросы без попаданий в кеш.
+        # APIClient ходит с Host: testserver, как в тестах Django
+        with override_settings(QUERY_INSPECTOR_ENABLED=True,
+                               QUERY_INSPECTOR_STRICT=True,
+                               CACHES=DUMMY_CACHES,
+                               ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS,
+                                              'testserver']):
+            with transaction.atomic():
+                for client, url in self.requests():
+                    failures += self.check_request(client, url)
+                transaction.set_rollback(True)
+        if failures:
+            raise CommandError('\n\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Бюджеты запросов соблюдены.'))
+
+    def check_request(self, client, url):
+        recorder = QueryRecorder()
+        try:
+            with connection.execute_wrapper(recorder):
+                response = client.get(url)
+        except QueryBudgetExceeded as error:
+            self.stdout.write(self.style.ERROR(f'{url}: нарушение'))
+            return [str(error)]
+        self.stdout.write(
+            f'{url}: {response.status_code}, '
+            f'запросов {len(recorder.queries)}')
+        if response.status_code >= 400:
+            return [f'{url}: ответ {response.status_code}']
+        return []
+
+    def requests(self):
+        """Пары (клиент, адрес): анонимные и от имени пользователя."""
+        viewer = User.objects.order_by('id').first()
+        recipes = list(Recipe.objects.exclude(author=viewer).order_by(
+            '-id')[:FIXTURE_SIZE])
+        tag = Tag.objects.order_by('id').first()
+        if viewer is None or not recipes or tag is None:
+            raise CommandError('Мало данных: выполните generate_data.')
+        Follow.objects.bulk_create([
+            Follow(user=viewer, author_id=author_id)
+            for author_id in {recipe.author_id for recipe in recipes}
+        ], ignore_conflicts=True)
+        ShoppingCart.objects.bulk_create([
+            ShoppingCart(user=viewer, recipe=recipe) for recipe in recipes
+        ], ignore_conflicts=True)
+        Recipe.favorites.through.objects.bulk_create([
+            Recipe.favorites.through(user=viewer, recipe=recipe)
+            for recipe in recipes
+        ], ignore_conflicts=True)
+
+        anonymous = APIClient()
+        client = APIClient()
+        client.force_authenticate(viewer)
+        recipe = recipes[0]
+        for url in ('/api/recipes/?limit=6',
+                    f'/api/recipes/?limit=6&tags={tag.slug}',
+                    f'/api/recipes/{recipe.id}/',
+                    '/api/users/?limit=6',
+                    f'/api/users/{recipe.author_id}/',
+                    '/api/tags/',
+                    '/api/ingredients/?name=а',
+                    '/api/sync/'):
+            yield anonymous, url
+        for url in ('/api/recipes/?limit=6',
+                    '/api/recipes/?limit=6&is_favorited=1',
+                    '/api/recipes/?limit=6&is_in_shopping_cart=1',
+                    f'/api/recipes/{recipe.id}/',
+                    '/api/users/me/',
+                    '/api/users/subscriptions/?limit=6&recipes_limit=3',
+                    '/api/recipes/download_shopping_cart/?format=txt',
+                    '/api/recipes/download_shopping_cart/?format=pdf',
+                    '/api/recipes/download_shopping_cart/?format=csv'):
+            yield client, url
@@ -0,0 +1,82 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.cache import INGREDIENTS, RECIPES, TAGS, USERS, invalidate
+from api.purgers import purge
+
+
+def postgres_env():
+    """Параметры подключения для pg_dump и pg_restore из DATABASES."""
+    settings_dict = connection.settings_dict
+    env = dict(os.environ)
+    for variable, key in (('PGDATABASE', 'NAME'), ('PGUSER', 'USER'),
+                          ('PGPASSWORD', 'PASSWORD'), ('PGHOST', 'HOST'),
+                          ('PGPORT', 'PORT')):
+        if settings_dict.get(key):
+            env[variable] = str(settings_dict[key])
+    return env
+
+
+def run(*command):
+    if shutil.which(command[0]) is None:
+        raise CommandError(f'Не найдена программа {command[0]}.')
+    result = subprocess.run(command, env=postgres_env(),
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise CommandError(result.stderr.strip())
+
+
+class Command(BaseCommand):
+    help = ('Сохраняет базу данных в файл и восстанавливает её из него, '
+            'например набор generate_data перед нагрузочным тестом. '
+            'PostgreSQL: pg_dump/pg_restore, SQLite: копия файла базы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=('save', 'restore'))
+        parser.add_argument('path', type=Path, help='Файл снимка.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if options['action'] == 'restore' and not path.is_file():
+            raise CommandError(f'Файл {path} не найден.')
+        vendor = connection.vendor
+        if vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'СУБД {vendor} не поддерживается.')
+        getattr(self, f'{options["action"]}_{vendor}')(path)
+
+        if options['action'] == 'restore':
+            invalidate(RECIPES, TAGS, INGREDIENTS, USERS)
+            purge('recipes')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {path} ({path.stat().st_size} байт)'))
+
+    def save_postgresql(self, path):
+        run('pg_dump', '--format=custom', '--no-owner', f'--file={path}')
+
+    def restore_postgresql(self, path):
+        # Открытые соединения держат блокировки на таблицах
+        connection.close()
+        run('pg_restore', '--clean', '--if-exists', '--no-owner',
+            '--single-transaction', f'--dbname={postgres_env()["PGDATABASE"]}',
+            str(path))
+
+    def save_sqlite(self, path):
+        if path.exists():
+            path.unlink()
+        with connection.cursor() as cursor:
+            # Согласованная копия без остановки приложения
+            cursor.execute('VACUUM INTO %s', [str(path)])
+
+    def restore_sqlite(self, path):
+        connection.ensure_connection()
+        source = sqlite3.connect(path)
+        try:
+            source.backup(connection.connection)
+        finally:
+            source.close()
@@ -0,0 +1,42 @@
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+
+from api.export import export_recipes
+from api.snapshots import make_request
+
+
+class Command(BaseCommand):
+    help = ('Выгружает весь каталог рецептов в NDJSON: по рецепту '
+            'с ингредиентами, тегами и автором в строке.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o',
+                            help='Файл для записи, по умолчанию stdout.')
+        parser.add_argument('--after', type=int, default=0,
+                            help='Продолжить после рецепта с этим id.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=settings.EXPORT_CHUNK_SIZE,
+                            help='Рецептов за одно чтение курсора.')
+
+    def handle(self, *args, **options):
+        # Ссылки на изображения строятся для адреса сайта, как у снимков
+        request = Request(make_request('/api/recipes/export/'))
+        output = (open(options['output'], 'ab' if options['after'] else 'wb')
+                  if options['output'] else sys.stdout.buffer)
+        started = time.perf_counter()
+        lines = 0
+        try:
+            for chunk in export_recipes(request, options['after'],
+                                        options['chunk_size']):
+                output.write(chunk)
+                lines += chunk.count(b'\n')
+        finally:
+            if options['output']:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {lines} за '
+            f'{time.perf_counter() - started:.1f} с'))
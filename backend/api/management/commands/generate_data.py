@@ -0,0 +1,299 @@
+import io
+import random
+import string
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from api.bulk import COPY_BATCH_SIZE, copy_rows
+from api.cache import RECIPES, TAGS, USERS, invalidate
+from api.purgers import purge
+from carts.models import ShoppingCart
+from recipes.models import ChangeLog, Ingredient, Recipe, RecipeIngredient, Tag
+from shortener.models import ShortLink
+from users.models import Follow, User
+
+IMAGE_FOLDER = Recipe._meta.get_field('image').upload_to
+PASSWORD = 'generated-password'
+SHORT_CODE_LENGTH = 6
+SHORT_CODE_CHARS = string.ascii_letters + string.digits
+DAYS = 365
+
+DEFAULT_TAGS = (
+    ('Завтрак', 'breakfast'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'dinner'),
+)
+FIRST_NAMES = (
+    'Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Елена',
+    'Дмитрий', 'Наталья', 'Алексей', 'Татьяна', 'Михаил',
+)
+LAST_NAMES = (
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев',
+    'Козлов', 'Новиков', 'Морозов', 'Волков', 'Зайцев', 'Павлов',
+)
+DISHES = (
+    'Суп', 'Салат', 'Пирог', 'Рагу', 'Запеканка', 'Паста', 'Каша',
+    'Омлет', 'Плов', 'Котлеты', 'Блины', 'Соус',
+)
+SENTENCES = (
+    'Нарезать все ингредиенты.',
+    'Разогреть сковороду с маслом.',
+    'Довести до кипения и убавить огонь.',
+    'Посолить и поперчить по вкусу.',
+    'Перемешать и оставить на десять минут.',
+    'Выпекать в духовке до золотистой корочки.',
+    'Подавать горячим.',
+    'Украсить зеленью.',
+)
+
+
+def zipf_weights(size, exponent=1.0):
+    """
+    Накопленные веса распределения Ципфа для random.choices: элемент
+    с рангом r выбирается пропорционально 1 / r ** exponent.
+    """
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+def shuffled(rng, items):
+    """Копия в случайном порядке: популярность не привязана к id."""
+    items = list(items)
+    rng.shuffle(items)
+    return items
+
+
+class Command(BaseCommand):
+    help = ('Генерирует воспроизводимый по seed набор данных: '
+            'пользователей, рецепты, подписки, избранное, корзины '
+            'и короткие ссылки. Популярность авторов и рецептов '
+            'распределена по степенному закону. Запись идёт пачками '
+            'в обход ORM (COPY на PostgreSQL).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100,
+                            help='Количество пользователей.')
+        parser.add_argument('--recipes', type=int, default=1000,
+                            help='Количество рецептов.')
+        parser.add_argument('--follows', type=float, default=10,
+                            help='Подписок на пользователя в среднем.')
+        parser.add_argument('--favorites', type=float, default=20,
+                            help='Рецептов в избранном в среднем.')
+        parser.add_argument('--carts', type=float, default=3,
+                            help='Рецептов в корзине в среднем.')
+        parser.add_argument('--short-links', type=float, default=0.1,
+                            help='Доля рецептов с короткой ссылкой.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора случайных чисел.')
+        parser.add_argument('--batch-size', type=int,
+                            default=COPY_BATCH_SIZE,
+                            help='Строк в одной вставке.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['recipes'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь и рецепт.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = f'gen{options["seed"]}_'
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Данные с seed {options["seed"]} уже созданы: восстановите '
+                f'снимок командой db_snapshot или выберите другой seed.')
+        if not Ingredient.objects.exists():
+            raise CommandError(
+                'Нет ингредиентов: сначала выполните import_csv.')
+        self.now = timezone.now()
+        self.totals = {}
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            if not Tag.objects.exists():
+                for name, slug in DEFAULT_TAGS:
+                    Tag.objects.create(name=name, slug=slug)
+            user_ids = self.step('Пользователи', self.create_users,
+                                 options['users'])
+            recipe_ids = self.step('Рецепты', self.create_recipes,
+                                   user_ids, options['recipes'])
+            self.step('Подписки', self.create_follows,
+                      user_ids, options['follows'])
+            self.step('Избранное', self.create_user_recipes,
+                      Recipe.favorites.through, user_ids, recipe_ids,
+                      options['favorites'])
+            self.step('Корзины', self.create_user_recipes,
+                      ShoppingCart, user_ids, recipe_ids, options['carts'])
+            self.step('Короткие ссылки', self.create_short_links,
+                      recipe_ids, options['short_links'])
+
+        invalidate(RECIPES, TAGS, USERS)
+        purge('recipes')
+        if settings.SNAPSHOTS_ENABLED:
+            self.stdout.write('Снимки рецептов не обновлялись: выполните '
+                              'publish_snapshots.')
+        elapsed = time.perf_counter() - started
+        rows = sum(self.totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк: {rows} за {elapsed:.1f} с '
+            f'({rows / elapsed if elapsed else 0:.0f} строк/с)'))
+
+    def step(self, title, method, *args):
+        started = time.perf_counter()
+        self.inserted = 0
+        result = method(*args)
+        self.totals[title] = self.inserted
+        self.stdout.write(f'{title}: {self.inserted} строк за '
+                          f'{time.perf_counter() - started:.1f} с')
+        return result
+
+    def copy(self, model, fields, rows):
+        self.inserted += copy_rows(model, fields, rows, self.batch_size)
+
+    def insert_returning_ids(self, model, fields, rows):
+        """
+        Вставляет строки и возвращает их id в порядке вставки: команда
+        работает в одной транзакции, новые id идут подряд за прежними.
+        """
+        last_id = model.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        self.copy(model, fields, rows)
+        return list(model.objects.filter(id__gt=last_id).order_by(
+            'id').values_list('id', flat=True))
+
+    def timestamp(self):
+        """Момент в пределах последнего года в формате столбца СУБД."""
+        moment = self.now - timedelta(
+            seconds=self.rng.randrange(DAYS * 24 * 60 * 60))
+        return connection.ops.adapt_datetimefield_value(moment)
+
+    def create_users(self, count):
+        # Один хеш на всех: make_password намеренно медленный
+        password = make_password(PASSWORD)
+        rows = (
+            (
+                password, False, f'{self.prefix}{number}',
+                self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES),
+                f'{self.prefix}{number}@example.com',
+                False, True, self.timestamp(),
+            )
+            for number in range(count)
+        )
+        return self.insert_returning_ids(User, (
+            'password', 'is_superuser', 'username', 'first_name',
+            'last_name', 'email', 'is_staff', 'is_active', 'date_joined',
+        ), rows)
+
+    def placeholder_image(self):
+        name = f'{IMAGE_FOLDER}generated.png'
+        if not default_storage.exists(name):
+            buffer = io.BytesIO()
+            Image.new('RGB', (64, 64), (230, 160, 60)).save(buffer, 'PNG')
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        return name
+
+    def create_recipes(self, user_ids, count):
+        rng = self.rng
+        image = self.placeholder_image()
+        max_name = Recipe._meta.get_field('name').max_length
+        max_text = Recipe._meta.get_field('text').max_length
+        authors = shuffled(rng, user_ids)
+        author_weights = zipf_weights(len(authors))
+
+        def recipes():
+            for author_id in rng.choices(
+                    authors, cum_weights=author_weights, k=count):
+                moment = self.timestamp()
+                text = ' '.join(rng.sample(SENTENCES, rng.randint(2, 5)))
+                yield (
+                    f'{rng.choice(DISHES)} №{rng.randrange(1000)}'[:max_name],
+                    text[:max_text], rng.randint(5, 180), image,
+                    author_id, moment, moment,
+                )
+
+        recipe_ids = self.insert_returning_ids(Recipe, (
+            'name', 'text', 'cooking_time', 'image', 'author_id',
+            'created', 'updated',
+        ), recipes())
+
+        tags = shuffled(rng, Tag.objects.values_list('id', flat=True))
+        tag_weights = zipf_weights(len(tags))
+        ingredients = shuffled(
+            rng, Ingredient.objects.values_list('id', flat=True))
+        ingredient_weights = zipf_weights(len(ingredients))
+        self.copy(Recipe.tags.through, ('recipe_id', 'tag_id'), (
+            (recipe_id, tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in set(rng.choices(
+                tags, cum_weights=tag_weights,
+                k=rng.randint(1, min(3, len(tags)))))
+        ))
+        self.copy(RecipeIngredient, ('recipe_id', 'ingredient_id', 'amount'), (
+            (recipe_id, ingredient_id, rng.randint(1, 50) * 10)
+            for recipe_id in recipe_ids
+            for ingredient_id in set(rng.choices(
+                ingredients, cum_weights=ingredient_weights,
+                k=rng.randint(3, 12)))
+        ))
+        # Вставка в обход ORM не отправляет сигналы, журнал ведём сами
+        moment = connection.ops.adapt_datetimefield_value(self.now)
+        self.copy(ChangeLog, ('kind', 'object_id', 'action', 'created'), (
+            (ChangeLog.RECIPE, recipe_id, ChangeLog.UPSERT, moment)
+            for recipe_id in recipe_ids
+        ))
+        return recipe_ids
+
+    def sample_counts(self, user_ids, mean, limit):
+        """Сколько объектов у каждого пользователя: в среднем mean."""
+        for user_id in user_ids:
+            count = int(self.rng.expovariate(1 / mean)) if mean > 0 else 0
+            yield user_id, min(count, limit)
+
+    def create_follows(self, user_ids, mean):
+        # Число подписчиков автора подчиняется закону Ципфа
+        authors = shuffled(self.rng, user_ids)
+        weights = zipf_weights(len(authors))
+        self.copy(Follow, ('user_id', 'author_id'), (
+            (user_id, author_id)
+            for user_id, count in self.sample_counts(
+                user_ids, mean, len(authors) - 1)
+            for author_id in set(self.rng.choices(
+                authors, cum_weights=weights, k=count))
+            if author_id != user_id
+        ))
+
+    def create_user_recipes(self, model, user_ids, recipe_ids, mean):
+        recipes = shuffled(self.rng, recipe_ids)
+        weights = zipf_weights(len(recipes))
+        self.copy(model, ('user_id', 'recipe_id'), (
+            (user_id, recipe_id)
+            for user_id, count in self.sample_counts(
+                user_ids, mean, len(recipes))
+            for recipe_id in set(self.rng.choices(
+                recipes, cum_weights=weights, k=count))
+        ))
+
+    def create_short_links(self, recipe_ids, share):
+        used = set(ShortLink.objects.values_list('short_code', flat=True))
+        base = f'http{"s" if settings.SNAPSHOT_SECURE else ""}://'
+        base += f'{settings.SNAPSHOT_HOST}/api/recipes/'
+
+        def links():
+            for recipe_id in recipe_ids:
+                if self.rng.random() >= share:
+                    continue
+                code = None
+                while code is None or code in used:
+                    code = ''.join(self.rng.choices(
+                        SHORT_CODE_CHARS, k=SHORT_CODE_LENGTH))
+                used.add(code)
+                yield code, f'{base}{recipe_id}/'
+
+        self.copy(ShortLink, ('short_code', 'original_url'), links())
@@ -0,0 +1,301 @@
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from PIL import Image
+
+from api.bulk import copy_rows
+from api.cache import RECIPES, invalidate
+from api.purgers import purge
+from api.snapshots import publish
+from recipes.changelog import log_changes
+from recipes.models import ChangeLog, Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+IMAGE_FOLDER = Recipe._meta.get_field('image').upload_to
+
+
+class RowError(Exception):
+    """Строка не прошла проверку и пропускается."""
+
+
+def store_image(path):
+    """
+    Проверяет изображение и сохраняет его в хранилище медиа.
+    Выполняется в отдельном процессе; возвращает (имя файла, ошибка).
+    """
+    try:
+        with Image.open(path) as image:
+            image.verify()
+            extension = (image.format or 'png').lower()
+        with open(path, 'rb') as file:
+            name = default_storage.save(
+                f'{IMAGE_FOLDER}{uuid.uuid4()}.{extension}', File(file))
+    except (OSError, SyntaxError, ValueError) as error:
+        return None, f'Некорректное изображение {path}: {error}'
+    return name, None
+
+
+def read_rows(path):
+    """Пары (номер записи, словарь) из JSON-массива или NDJSON."""
+    with open(path, encoding='utf-8') as file:
+        first = file.read(1)
+        while first.isspace():
+            first = file.read(1)
+        file.seek(0)
+        if first == '[':
+            # Массив читается целиком: ошибка в нём не пропускает строку,
+            # а останавливает загрузку
+            try:
+                rows = json.load(file)
+            except json.JSONDecodeError as error:
+                raise CommandError(
+                    f'{path}: некорректный JSON, строка {error.lineno}, '
+                    f'столбец {error.colno}: {error.msg}')
+            yield from enumerate(rows, start=1)
+            return
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as error:
+                yield number, error
+
+
+class Command(BaseCommand):
+    help = ('Массово загружает рецепты из JSON или NDJSON: ингредиенты '
+            'по названию, теги по slug, изображения из локальных файлов. '
+            'Ошибочные строки пропускаются и выводятся в отчёте.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSON (массив) или NDJSON.')
+        parser.add_argument('--author',
+                            help='Email автора для строк без поля author.')
+        parser.add_argument('--images-dir',
+                            help='Каталог относительных путей изображений, '
+                                 'по умолчанию каталог файла.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Строк в одной транзакции.')
+        parser.add_argument('--workers', type=int,
+                            default=os.cpu_count() or 1,
+                            help='Процессов для обработки изображений, '
+                                 '0 — без отдельных процессов.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только проверить строки, ничего '
+                                 'не записывая.')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f'Файл {path} не найден.')
+        self.images_dir = Path(options['images_dir'] or path.parent)
+        self.default_author = options['author']
+        self.dry_run = options['dry_run']
+        self.max_name = Recipe._meta.get_field('name').max_length
+        self.max_text = Recipe._meta.get_field('text').max_length
+        # Справочники целиком в памяти: проверка строк без запросов
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {}
+        for ingredient_id, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'):
+            self.ingredients.setdefault(name, {})[unit] = ingredient_id
+
+        executor = None
+        if options['workers'] and not self.dry_run:
+            # Дочерние процессы не должны наследовать соединения с БД
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'], initializer=django.setup)
+
+        started = time.perf_counter()
+        self.created_ids = []
+        self.errors = []
+        total = 0
+        rows = read_rows(path)
+        try:
+            while batch := list(islice(rows, options['batch_size'])):
+                total += len(batch)
+                self.import_batch(batch, executor)
+                self.stderr.write(
+                    f'Обработано строк: {total}, создано рецептов: '
+                    f'{len(self.created_ids)}, ошибок: {len(self.errors)}')
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        if self.created_ids:
+            invalidate(RECIPES)
+            purge('recipes')
+            if settings.SNAPSHOTS_ENABLED:
+                publish(recipe_ids=self.created_ids)
+
+        elapsed = time.perf_counter() - started
+        for number, message in self.errors:
+            self.stderr.write(self.style.ERROR(f'Запись {number}: {message}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк: {total}, создано рецептов: {len(self.created_ids)}, '
+            f'ошибок: {len(self.errors)} за {elapsed:.1f} с '
+            f'({total / elapsed if elapsed else 0:.0f} строк/с)'))
+
+    def import_batch(self, batch, executor):
+        emails = {
+            row.get('author') or self.default_author
+            for _, row in batch if isinstance(row, dict)
+        }
+        emails = {email for email in emails if isinstance(email, str)}
+        self.authors = dict(User.objects.filter(
+            email__in=emails).values_list('email', 'id'))
+
+        valid = []
+        for number, row in batch:
+            try:
+                valid.append((number, self.parse_row(row)))
+            except RowError as error:
+                self.errors.append((number, str(error)))
+        if self.dry_run or not valid:
+            return
+
+        image_paths = [recipe['image'] for _, recipe in valid]
+        if executor is None:
+            stored = [store_image(image) for image in image_paths]
+        else:
+            stored = list(executor.map(store_image, image_paths))
+        ready = []
+        for (number, recipe), (name, error) in zip(valid, stored):
+            if error:
+                self.errors.append((number, error))
+            else:
+                recipe['image'] = name
+                ready.append((number, recipe))
+        if not ready:
+            return
+
+        try:
+            self.write_batch([recipe for _, recipe in ready])
+        except Exception as error:
+            for _, recipe in ready:
+                default_storage.delete(recipe['image'])
+            self.errors += [(number, f'Пачка не записана: {error}')
+                            for number, _ in ready]
+
+    @transaction.atomic
+    def write_batch(self, recipes):
+        created = Recipe.objects.bulk_create([
+            Recipe(
+                name=recipe['name'],
+                text=recipe['text'],
+                cooking_time=recipe['cooking_time'],
+                author_id=recipe['author_id'],
+                image=recipe['image'],
+            )
+            for recipe in recipes
+        ])
+        copy_rows(Recipe.tags.through, ('recipe_id', 'tag_id'), [
+            (instance.pk, tag_id)
+            for instance, recipe in zip(created, recipes)
+            for tag_id in recipe['tag_ids']
+        ])
+        copy_rows(RecipeIngredient, ('recipe_id', 'ingredient_id', 'amount'), [
+            (instance.pk, ingredient_id, amount)
+            for instance, recipe in zip(created, recipes)
+            for ingredient_id, amount in recipe['ingredients']
+        ])
+        recipe_ids = [instance.pk for instance in created]
+        # bulk_create не отправляет сигналы, журнал ведём сами
+        log_changes(ChangeLog.RECIPE, recipe_ids)
+        self.created_ids += recipe_ids
+
+    def parse_row(self, row):
+        """Проверяет строку по справочникам в памяти, без запросов к БД."""
+        if isinstance(row, Exception):
+            raise RowError(f'Некорректный JSON: {row}')
+        if not isinstance(row, dict):
+            raise RowError('Ожидается объект рецепта.')
+
+        name = row.get('name')
+        text = row.get('text')
+        if not isinstance(name, str) or not name.strip():
+            raise RowError('Не указано название.')
+        if len(name) > self.max_name:
+            raise RowError('Слишком длинное название.')
+        if not isinstance(text, str) or not text.strip():
+            raise RowError('Не указано описание.')
+        if len(text) > self.max_text:
+            raise RowError('Слишком длинное описание.')
+        cooking_time = row.get('cooking_time')
+        if (not isinstance(cooking_time, int) or isinstance(cooking_time, bool)
+                or cooking_time < 1):
+            raise RowError(
+                'Время приготовления не может быть меньше 1 минуты.')
+
+        email = row.get('author') or self.default_author
+        if not isinstance(email, str) or email not in self.authors:
+            raise RowError(f'Автор {email} не найден.')
+
+        slugs = row.get('tags') or []
+        if not isinstance(slugs, list) or not slugs:
+            raise RowError('Список тегов не может быть пустым.')
+        if not all(isinstance(slug, str) for slug in slugs):
+            raise RowError('Теги указываются строками slug.')
+        if len(slugs) != len(set(slugs)):
+            raise RowError('Теги не должны повторяться.')
+        unknown = [slug for slug in slugs if slug not in self.tags]
+        if unknown:
+            raise RowError(f'Неизвестные теги: {", ".join(unknown)}')
+
+        ingredients = []
+        for item in row.get('ingredients') or []:
+            if not isinstance(item, dict):
+                raise RowError('Ингредиент должен быть объектом.')
+            ingredient_name = item.get('name')
+            units = self.ingredients.get(ingredient_name) if isinstance(
+                ingredient_name, str) else None
+            if not units:
+                raise RowError(f'Ингредиент {ingredient_name} не найден.')
+            unit = item.get('measurement_unit')
+            if unit is None and len(units) == 1:
+                [ingredient_id] = units.values()
+            elif unit in units:
+                ingredient_id = units[unit]
+            else:
+                raise RowError(
+                    f'Для ингредиента {ingredient_name} укажите '
+                    f'measurement_unit: '
+                    f'{", ".join(units)}.')
+            amount = item.get('amount')
+            if (not isinstance(amount, int) or isinstance(amount, bool)
+                    or amount <= 0):
+                raise RowError('Количество ингредиента должно быть > 0.')
+            ingredients.append((ingredient_id, amount))
+        if not ingredients:
+            raise RowError('Список ингредиентов пуст.')
+        if len(ingredients) != len(dict(ingredients)):
+            raise RowError('Ингредиенты не должны повторяться.')
+
+        image = row.get('image')
+        if not isinstance(image, str) or not image:
+            raise RowError('Не указано изображение!')
+        image = self.images_dir / image
+        if not image.is_file():
+            raise RowError(f'Файл изображения {image} не найден.')
+
+        return {
+            'name': name,
+            'text': text,
+            'cooking_time': cooking_time,
+            'author_id': self.authors[email],
+            'tag_ids': [self.tags[slug] for slug in slugs],
+            'ingredients': ingredients,
+            'image': str(image),
+        }
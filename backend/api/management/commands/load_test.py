@@ -0,0 +1,323 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from api.management.commands.generate_data import PASSWORD
+from api.stats import summarize, write_report
+
+SCENARIOS = {
+    'browse': 60,
+    'favorites': 15,
+    'cart': 10,
+    'subscriptions': 10,
+    'short_links': 5,
+}
+CART_FORMATS = ('txt', 'pdf', 'csv')
+INGREDIENT_PREFIXES = ('мо', 'са', 'ка', 'по', 'ку', 'ри', 'я')
+SETUP_PAGES = 5
+SETUP_PAGE_SIZE = 100
+SHORT_LINKS = 10
+
+
+class Stats:
+    """Длительности и ошибки по эндпоинтам; пишут все потоки сразу."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name, duration, status, ok):
+        with self.lock:
+            self.durations[name].append(duration)
+            self.statuses[name][status] += 1
+            if not ok:
+                self.errors[name] += 1
+
+    def report(self, elapsed):
+        endpoints = {}
+        for name in sorted(self.durations):
+            durations = self.durations[name]
+            endpoints[name] = {
+                **summarize(durations),
+                'errors': self.errors[name],
+                'rps': round(len(durations) / elapsed, 2),
+                'statuses': dict(self.statuses[name]),
+            }
+        everything = [
+            duration for durations in self.durations.values()
+            for duration in durations
+        ]
+        total = {
+            **summarize(everything),
+            'errors': sum(self.errors.values()),
+            'rps': round(len(everything) / elapsed, 2),
+        }
+        return total, endpoints
+
+
+class VirtualUser:
+    """
+    Пользователь сценариев: анонимная сессия для просмотра и, после
+    входа под аккаунтом generate_data, сессия с токеном.
+    """
+
+    def __init__(self, command, number):
+        self.command = command
+        self.rng = random.Random(command.seed * 1000003 + number)
+        self.email = (f'gen{command.seed}_{number % command.accounts}'
+                      f'@example.com')
+        self.anonymous = requests.Session()
+        self.session = None
+
+    def request(self, name, method, path, expected=(200,), session=None,
+                **kwargs):
+        session = session or self.session or self.anonymous
+        started = time.perf_counter()
+        try:
+            response = session.request(
+                method, self.command.base_url + path,
+                timeout=self.command.timeout, allow_redirects=False,
+                **kwargs)
+        except requests.RequestException:
+            self.command.stats.record(
+                name, time.perf_counter() - started, 'error', False)
+            return None
+        self.command.stats.record(
+            name, time.perf_counter() - started, response.status_code,
+            response.status_code in expected)
+        return response
+
+    def login(self):
+        if self.session is not None:
+            return
+        session = requests.Session()
+        response = self.request(
+            'POST /api/auth/token/login/', 'POST', '/api/auth/token/login/',
+            session=session,
+            json={'email': self.email, 'password': PASSWORD})
+        if response is not None and response.status_code == 200:
+            session.headers['Authorization'] = (
+                f'Token {response.json()["auth_token"]}')
+        self.session = session
+
+    def recipe_id(self):
+        return self.rng.choice(self.command.recipe_ids)
+
+    def browse(self):
+        rng = self.rng
+        page = rng.randint(1, 10)
+        if rng.random() < 0.5:
+            tags = rng.sample(self.command.tags,
+                              min(rng.randint(1, 2), len(self.command.tags)))
+            query = '&'.join(f'tags={slug}' for slug in tags)
+            self.request('GET /api/recipes/?tags', 'GET',
+                         f'/api/recipes/?page={page}&limit=6&{query}',
+                         session=self.anonymous)
+        else:
+            self.request('GET /api/recipes/', 'GET',
+                         f'/api/recipes/?page={page}&limit=6',
+                         session=self.anonymous)
+        for _ in range(rng.randint(1, 3)):
+            self.request('GET /api/recipes/{id}/', 'GET',
+                         f'/api/recipes/{self.recipe_id()}/',
+                         session=self.anonymous)
+        if rng.random() < 0.2:
+            self.request('GET /api/tags/', 'GET', '/api/tags/',
+                         session=self.anonymous)
+        if rng.random() < 0.2:
+            self.request('GET /api/ingredients/?name', 'GET',
+                         '/api/ingredients/',
+                         params={'name': rng.choice(INGREDIENT_PREFIXES)},
+                         session=self.anonymous)
+
+    def favorites(self):
+        self.login()
+        recipe_id = self.recipe_id()
+        self.request('POST /api/recipes/{id}/favorite/', 'POST',
+                     f'/api/recipes/{recipe_id}/favorite/',
+                     expected=(201, 400))
+        self.request('GET /api/recipes/?is_favorited', 'GET',
+                     '/api/recipes/?is_favorited=1&page=1&limit=6')
+        self.request('DELETE /api/recipes/{id}/favorite/', 'DELETE',
+                     f'/api/recipes/{recipe_id}/favorite/',
+                     expected=(204, 400))
+
+    def cart(self):
+        self.login()
+        for _ in range(self.rng.randint(1, 5)):
+            self.request('POST /api/recipes/{id}/shopping_cart/', 'POST',
+                         f'/api/recipes/{self.recipe_id()}/shopping_cart/',
+                         expected=(201, 400))
+        for file_format in CART_FORMATS:
+            self.request(
+                f'GET /api/recipes/download_shopping_cart/?format='
+                f'{file_format}', 'GET',
+                f'/api/recipes/download_shopping_cart/?format={file_format}')
+        self.request('DELETE /api/recipes/shopping_cart/clear/', 'DELETE',
+                     '/api/recipes/shopping_cart/clear/')
+
+    def subscriptions(self):
+        self.login()
+        author_id = self.rng.choice(self.command.author_ids)
+        self.request('GET /api/users/subscriptions/', 'GET',
+                     '/api/users/subscriptions/?page=1&limit=6'
+                     '&recipes_limit=3')
+        self.request('POST /api/users/{id}/subscribe/', 'POST',
+                     f'/api/users/{author_id}/subscribe/',
+                     expected=(201, 400))
+        self.request('DELETE /api/users/{id}/subscribe/', 'DELETE',
+                     f'/api/users/{author_id}/subscribe/',
+                     expected=(204, 400))
+
+    def short_links(self):
+        self.request('GET /s/{code}/', 'GET',
+                     f'/s/{self.rng.choice(self.command.short_codes)}/',
+                     expected=(302,), session=self.anonymous)
+
+    def run(self, deadline):
+        names = list(self.command.scenarios)
+        weights = list(self.command.scenarios.values())
+        while time.monotonic() < deadline:
+            getattr(self, self.rng.choices(names, weights)[0])()
+            if self.command.think:
+                time.sleep(self.rng.expovariate(1 / self.command.think))
+
+
+def parse_scenario(value):
+    name, _, weight = value.partition('=')
+    if name not in SCENARIOS or not weight.isdigit():
+        raise CommandError(
+            f'Сценарий задаётся как имя=вес, имена: {", ".join(SCENARIOS)}.')
+    return name, int(weight)
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест работающего сервера по сценариям реального '
+            'трафика. Выводит RPS и p50/p95/p99 по эндпоинтам и '
+            'сохраняет их в JSON. Аккаунты берутся из generate_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000',
+                            help='Адрес сервера.')
+        parser.add_argument('--users', type=int, default=10,
+                            help='Одновременных виртуальных пользователей.')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Длительность теста в секундах.')
+        parser.add_argument('--think', type=float, default=0,
+                            help='Средняя пауза между сценариями, с.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='seed, с которым запускался generate_data.')
+        parser.add_argument('--accounts', type=int, default=100,
+                            help='Сколько аккаунтов generate_data '
+                                 'задействовать.')
+        parser.add_argument('--scenario', type=parse_scenario,
+                            action='append',
+                            help='Вес сценария, например cart=20; '
+                                 'можно указать несколько раз.')
+        parser.add_argument('--timeout', type=float, default=30,
+                            help='Таймаут запроса в секундах.')
+        parser.add_argument('--output', help='Файл для отчёта в JSON.')
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/')
+        self.seed = options['seed']
+        self.accounts = options['accounts']
+        self.timeout = options['timeout']
+        self.think = options['think']
+        self.scenarios = {**SCENARIOS, **dict(options['scenario'] or [])}
+        self.scenarios = {
+            name: weight for name, weight in self.scenarios.items() if weight
+        }
+        if not self.scenarios:
+            raise CommandError('Все сценарии выключены.')
+        self.setup()
+
+        self.stats = Stats()
+        started = time.monotonic()
+        deadline = started + options['duration']
+        with ThreadPoolExecutor(max_workers=options['users']) as executor:
+            futures = [
+                executor.submit(VirtualUser(self, number).run, deadline)
+                for number in range(options['users'])
+            ]
+            for future in futures:
+                future.result()
+        elapsed = time.monotonic() - started
+
+        total, endpoints = self.stats.report(elapsed)
+        self.print_table(total, endpoints)
+        if options['output']:
+            write_report(options['output'], {
+                'base_url': self.base_url,
+                'users': options['users'],
+                'duration': round(elapsed, 3),
+                'think': self.think,
+                'scenarios': self.scenarios,
+                'total': total,
+                'endpoints': endpoints,
+            })
+            self.stdout.write(f'Отчёт сохранён в {options["output"]}')
+
+    def get(self, path, **kwargs):
+        try:
+            response = requests.get(self.base_url + path,
+                                    timeout=self.timeout, **kwargs)
+            response.raise_for_status()
+        except requests.RequestException as error:
+            raise CommandError(f'Сервер недоступен: {error}')
+        return response.json()
+
+    def setup(self):
+        """Собирает id рецептов, авторов, теги и короткие ссылки."""
+        self.tags = [tag['slug'] for tag in self.get('/api/tags/')]
+        recipes = []
+        for page in range(1, SETUP_PAGES + 1):
+            data = self.get('/api/recipes/', params={
+                'page': page, 'limit': SETUP_PAGE_SIZE,
+                'fields': 'author'})
+            recipes += data['results']
+            if not data['next']:
+                break
+        if not recipes or not self.tags:
+            raise CommandError('Нет рецептов или тегов: выполните '
+                               'generate_data.')
+        self.recipe_ids = [recipe['id'] for recipe in recipes]
+        self.author_ids = sorted({recipe['author'] for recipe in recipes})
+        self.short_codes = [
+            urlsplit(self.get(
+                f'/api/recipes/{recipe_id}/get-link/')['short-link']
+            ).path.strip('/').split('/')[-1]
+            for recipe_id in self.recipe_ids[:SHORT_LINKS]
+        ]
+        needs_login = set(self.scenarios) - {'browse', 'short_links'}
+        if needs_login:
+            response = requests.post(
+                f'{self.base_url}/api/auth/token/login/',
+                json={'email': f'gen{self.seed}_0@example.com',
+                      'password': PASSWORD},
+                timeout=self.timeout)
+            if response.status_code != 200:
+                raise CommandError(
+                    f'Не удалось войти под gen{self.seed}_0@example.com: '
+                    f'выполните generate_data --seed {self.seed}.')
+
+    def print_table(self, total, endpoints):
+        header = (f'{"Эндпоинт":<52}{"запросов":>9}{"ошибок":>8}'
+                  f'{"RPS":>9}{"p50":>9}{"p95":>9}{"p99":>9}')
+        self.stdout.write(header)
+        for name, row in [*endpoints.items(), ('Всего', total)]:
+            if not row['count']:
+                continue
+            self.stdout.write(
+                f'{name:<52}{row["count"]:>9}{row["errors"]:>8}'
+                f'{row["rps"]:>9.1f}{row["p50_ms"]:>9.1f}'
+                f'{row["p95_ms"]:>9.1f}{row["p99_ms"]:>9.1f}')
+        self.stdout.write('Время ответа в миллисекундах.')
@@ -0,0 +1,59 @@
+import logging
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.snapshots import (RECIPES_BATCH_SIZE, publish_pending, rebuild,
+                           snapshot_root)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Полностью пересобирает JSON-снимки рецептов и первых страниц '
+            'списков, которые nginx отдаёт анонимным пользователям. '
+            'С --pending перерисовывает только изменения из очереди.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=min(8, os.cpu_count() or 1),
+                            help='Число параллельных потоков.')
+        parser.add_argument('--batch-size', type=int,
+                            default=RECIPES_BATCH_SIZE,
+                            help='Рецептов в одной пачке.')
+        parser.add_argument('--pending', action='store_true',
+                            help='Выполнить задачи из очереди изменений.')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='С --pending: проверять очередь каждые '
+                                 'столько секунд, не завершаясь.')
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            return self.publish_pending(options['interval'])
+        started = time.perf_counter()
+        recipes, pages = rebuild(options['workers'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Снимки обновлены в {snapshot_root()}: рецептов {recipes}, '
+            f'страниц списков {pages} за '
+            f'{time.perf_counter() - started:.1f} с'))
+
+    def publish_pending(self, interval):
+        while True:
+            started = time.perf_counter()
+            tasks = 0
+            try:
+                while done := publish_pending():
+                    tasks += done
+            except Exception:
+                if not interval:
+                    raise
+                # Задачи остаются в очереди до следующей попытки
+                logger.exception('Не удалось обновить снимки рецептов')
+            if tasks:
+                self.stdout.write(
+                    f'Выполнено задач: {tasks} за '
+                    f'{time.perf_counter() - started:.1f} с')
+            if not interval:
+                return
+            time.sleep(interval)
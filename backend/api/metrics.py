@@ -0,0 +1,102 @@
+import hmac
+import os
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+LABELS = ('route', 'method')
+
+REQUESTS = Counter(
+    'foodgram_http_requests_total',
+    'Запросы по маршруту, методу и статусу ответа.',
+    LABELS + ('status',))
+LATENCY = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса.',
+    LABELS)
+DB_QUERIES = Histogram(
+    'foodgram_http_request_db_queries',
+    'Число SQL-запросов на HTTP-запрос.',
+    LABELS, buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100))
+DB_DURATION = Histogram(
+    'foodgram_http_request_db_duration_seconds',
+    'Суммарное время SQL-запросов на HTTP-запрос.',
+    LABELS)
+RESPONSE_SIZE = Histogram(
+    'foodgram_http_response_size_bytes',
+    'Размер тела ответа после сжатия.',
+    LABELS, buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576))
+
+
+class QueryTimer:
+    """Обёртка execute_wrapper: число и суммарное время SQL-запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def route_name(request):
+    """
+    Имя маршрута вместо пути: recipes-detail, users-subscriptions.
+    Число значений метки не растёт вместе с числом объектов.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+def observe(request, response, duration, queries):
+    labels = (
+        route_name(request),
+        request.method if request.method in METHODS else 'other',
+    )
+    REQUESTS.labels(*labels, str(response.status_code)).inc()
+    LATENCY.labels(*labels).observe(duration)
+    DB_QUERIES.labels(*labels).observe(queries.count)
+    DB_DURATION.labels(*labels).observe(queries.duration)
+    if not response.streaming:
+        RESPONSE_SIZE.labels(*labels).observe(len(response.content))
+
+
+def server_timing(duration, queries):
+    return (f'db;dur={queries.duration * 1000:.1f};'
+            f'desc="{queries.count} queries", '
+            f'app;dur={duration * 1000:.1f}')
+
+
+def get_registry():
+    """
+    В gunicorn с PROMETHEUS_MULTIPROC_DIR каждый воркер пишет метрики
+    в свои файлы; при выдаче они собираются по всем воркерам.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus: по токену или для staff."""
+    authorization = request.headers.get('Authorization', '')
+    token_ok = settings.METRICS_TOKEN and hmac.compare_digest(
+        authorization.encode(), f'Bearer {settings.METRICS_TOKEN}'.encode())
+    if not token_ok and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,155 @@
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from profiling.profiler import get_profiler, profile_request, profile_requested
+
+from .metrics import QueryTimer, observe, server_timing
+from .queries import QueryRecorder, check_queries
+from .sqlcomment import SqlCommenter, get_request_id
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_brotli = re.compile(r'\bbr\b')
+BROTLI_CONTENT_TYPES = {'application/json'}
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Сжимает ответы больше COMPRESSION_MIN_SIZE байт.
+    JSON для клиентов, принимающих br, сжимается brotli (если он
+    установлен), остальное — gzip средствами GZipMiddleware. HTML
+    с CSRF-токенами идёт только через gzip: GZipMiddleware защищает
+    его от BREACH случайными байтами в сжатом потоке.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and (
+                len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return response
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if (brotli is None
+                or response.streaming
+                or response.has_header('Content-Encoding')
+                or content_type.strip() not in BROTLI_CONTENT_TYPES
+                or not re_accepts_brotli.search(accept_encoding)):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(
+            response.content, quality=settings.BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+
+        # Как и GZipMiddleware, ослабляем ETag: байты ответа изменились
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+class QueryInspectorMiddleware:
+    """
+    Записывает SQL каждого запроса и сообщает о запросах, повторённых
+    с разными параметрами (N+1). Работает при QUERY_INSPECTOR_ENABLED,
+    иначе отключается при старте и ничего не стоит.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTOR_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        if not getattr(request, 'queries_checked', False):
+            check_queries(recorder, f'{request.method} {request.path}')
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Считает для каждого маршрута время ответа, число и время
+    SQL-запросов, размер ответа и статус для /metrics. Сотрудникам
+    отдаёт те же цифры в заголовке Server-Timing.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        observe(request, response, duration, queries)
+        # DRF после аутентификации по токену кладёт пользователя в request
+        user = getattr(request, 'user', None)
+        if settings.SERVER_TIMING and user is not None and user.is_staff:
+            response.headers['Server-Timing'] = server_timing(
+                duration, queries)
+        return response
+
+
+class SqlCommentMiddleware:
+    """
+    Подписывает каждый SQL-запрос ORM комментарием sqlcommenter:
+    маршрут, viewset, действие и id запроса. По комментарию нагрузку
+    в pg_stat_activity и журнале медленных запросов видно по вьюхам.
+    Id запроса возвращается в заголовке X-Request-ID.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SQL_COMMENTER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = get_request_id(request)
+        commenter = SqlCommenter(request, request_id)
+        with ExitStack() as stack:
+            for database in connections.all():
+                stack.enter_context(database.execute_wrapper(commenter))
+            response = self.get_response(request)
+        response.headers['X-Request-ID'] = request_id
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запрос по заголовку X-Profile или параметру ?profile
+    для сотрудников и владельцев PROFILING_TOKEN. Профиль сохраняется
+    в админке, адрес приходит в заголовке X-Profile. Запросы без
+    флага проходят без профилировщиков.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profile_requested(request):
+            return self.get_response(request)
+        allowed, user = get_profiler(request)
+        if not allowed:
+            return self.get_response(request)
+        return profile_request(request, self.get_response, user)
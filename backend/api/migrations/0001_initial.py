@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-19 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+                ('recipe_ids', models.JSONField(default=list, verbose_name='Рецепты')),
+                ('tag_ids', models.JSONField(default=list, verbose_name='Теги')),
+                ('tag_slugs', models.JSONField(default=list, verbose_name='Слаги тегов')),
+            ],
+            options={
+                'verbose_name': 'Задача обновления снимков',
+                'verbose_name_plural': 'Задачи обновления снимков',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import models
+
+
+class SnapshotTask(models.Model):
+    """
+    Снимки, которые нужно перерисовать после зафиксированной транзакции.
+    Пишется одной строкой на транзакцию, выполняется командой
+    publish_snapshots --pending вне запроса пользователя.
+    """
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Дата')
+    recipe_ids = models.JSONField(default=list, verbose_name='Рецепты')
+    tag_ids = models.JSONField(default=list, verbose_name='Теги')
+    tag_slugs = models.JSONField(default=list,
+                                 verbose_name='Слаги тегов')
+
+    class Meta:
+        verbose_name = 'Задача обновления снимков'
+        verbose_name_plural = 'Задачи обновления снимков'
+        ordering = ['id']
+
+    def __str__(self):
+        return f'Снимки от {self.created:%Y-%m-%d %H:%M:%S}'
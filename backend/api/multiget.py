@@ -0,0 +1,53 @@
+from rest_framework import status
+from rest_framework.response import Response
+
+from .serializers import MultiGetSerializer
+
+
+class MultiGetMixin:
+    """
+    Пакетное получение объектов: list с параметром ?ids=1,2,3 отдаёт
+    объекты с этими id одним ответом без пагинации, в порядке запроса.
+    Для ненайденных id выводится {'id': ..., 'status': 'not_found'}.
+    Сериализация та же, что у списка, поэтому число запросов
+    не зависит от количества id.
+    """
+
+    def get_multi_get_ids(self):
+        """Id из ?ids= или None, если это обычный запрос списка."""
+        if self.action != 'list':
+            return None
+        if not hasattr(self, '_multi_get_ids'):
+            raw = self.request.query_params.get('ids')
+            ids = None
+            if raw is not None:
+                serializer = MultiGetSerializer(data={'ids': [
+                    item.strip() for item in raw.split(',') if item.strip()
+                ]})
+                serializer.is_valid(raise_exception=True)
+                ids = serializer.validated_data['ids']
+            self._multi_get_ids = ids
+        return self._multi_get_ids
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        ids = self.get_multi_get_ids()
+        if ids is not None:
+            queryset = queryset.filter(pk__in=set(ids))
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        if self.get_multi_get_ids() is not None:
+            return None
+        return super().paginate_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        ids = self.get_multi_get_ids()
+        if ids is None:
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_serializer(
+            self.filter_queryset(self.get_queryset()), many=True)
+        found = {item['id']: item for item in serializer.data}
+        return Response({'results': [
+            found.get(pk, {'id': pk, 'status': 'not_found'}) for pk in ids
+        ]}, status=status.HTTP_200_OK)
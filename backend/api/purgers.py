@@ -0,0 +1,56 @@
+import logging
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BasePurger:
+    """Сбрасывает в шлюзе или CDN ответы с заданными surrogate-ключами."""
+
+    def purge(self, keys):
+        raise NotImplementedError
+
+
+class NullPurger(BasePurger):
+    """Ничего не делает: кеширующего шлюза нет."""
+
+    def purge(self, keys):
+        pass
+
+
+class FilePurger(BasePurger):
+    """Дописывает ключи строкой в CACHE_PURGE_FILE, для отладки и тестов."""
+
+    def purge(self, keys):
+        with open(settings.CACHE_PURGE_FILE, 'a', encoding='utf-8') as file:
+            file.write(' '.join(keys) + '\n')
+
+
+class HttpPurger(BasePurger):
+    """Отправляет PURGE на CACHE_PURGE_URL с заголовком Surrogate-Key."""
+
+    def purge(self, keys):
+        try:
+            requests.request(
+                'PURGE',
+                settings.CACHE_PURGE_URL,
+                headers={'Surrogate-Key': ' '.join(keys)},
+                timeout=settings.CACHE_PURGE_TIMEOUT
+            ).raise_for_status()
+        except requests.RequestException:
+            logger.warning('Не удалось сбросить кеш для %s', keys,
+                           exc_info=True)
+
+
+def get_purger():
+    return import_string(settings.CACHE_PURGER)()
+
+
+def purge(*keys):
+    """Сбрасывает ключи после фиксации текущей транзакции."""
+    keys = sorted(set(keys))
+    transaction.on_commit(lambda: get_purger().purge(keys))
@@ -0,0 +1,136 @@
+import logging
+import re
+import time
+import traceback
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+re_placeholder_list = re.compile(r'IN \((?:%s, )*%s\)')
+re_values_list = re.compile(r'(\((?:%s, )*%s\))(?:, \1)+')
+STACK_LIMIT = 8
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Запрос превысил бюджет или повторил один запрос много раз.
+    Наследует AssertionError: в тестах это провал, а не ошибка.
+    """
+
+
+@dataclass
+class Query:
+    sql: str
+    params: object
+    duration: float
+    stack: list
+
+
+def query_shape(sql):
+    """
+    Форма запроса без параметров: списки IN (%s, %s, ...) и строки
+    VALUES разной длины сводятся к одной форме.
+    """
+    sql = re_values_list.sub(r'\1, ...', sql)
+    return re_placeholder_list.sub('IN (...)', sql)
+
+
+def project_stack():
+    """Кадры стека из кода проекта, без Django, DRF и этого модуля."""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return frames[-STACK_LIMIT:]
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper: запоминает SQL, параметры, время и стек."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        stack = project_stack()
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(Query(
+                sql, params, time.perf_counter() - started, stack))
+
+    def repeated(self, threshold):
+        """Формы запросов, выполненные не меньше threshold раз."""
+        shapes = defaultdict(list)
+        for query in self.queries:
+            shapes[query_shape(query.sql)].append(query)
+        return [
+            queries for queries in shapes.values()
+            if len(queries) >= threshold
+        ]
+
+
+def describe_repeated(queries):
+    first = queries[0]
+    return (
+        f'Запрос повторён {len(queries)} раз с разными параметрами '
+        f'(вероятно, N+1):\n{first.sql}\nПараметры первого: '
+        f'{first.params}\nСтек:\n'
+        + ''.join(traceback.format_list(first.stack))
+    )
+
+
+def check_queries(recorder, label, budget=None):
+    """
+    Проверяет записанные запросы: бюджет и повторяющиеся формы.
+    При QUERY_INSPECTOR_STRICT нарушение — исключение, иначе
+    предупреждение в лог.
+    """
+    problems = []
+    if budget is not None and len(recorder.queries) > budget:
+        problems.append(
+            f'{len(recorder.queries)} запросов при бюджете {budget}:\n'
+            + '\n'.join(query.sql for query in recorder.queries))
+    problems += [
+        describe_repeated(queries)
+        for queries in recorder.repeated(settings.QUERY_REPEAT_THRESHOLD)
+    ]
+    if not problems:
+        return
+    message = f'{label}: ' + '\n\n'.join(problems)
+    if settings.QUERY_INSPECTOR_STRICT:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def query_budget(max_queries):
+    """
+    Бюджет запросов к БД для действия viewset: не больше max_queries
+    за вызов, без повторяющихся запросов. Ставится под @action.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            if not settings.QUERY_INSPECTOR_ENABLED:
+                return handler(self, request, *args, **kwargs)
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = handler(self, request, *args, **kwargs)
+            # QueryInspectorMiddleware не проверяет запрос повторно
+            request._request.queries_checked = True
+            check_queries(
+                recorder, f'{type(self).__name__}.{handler.__name__}',
+                max_queries)
+            return response
+
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
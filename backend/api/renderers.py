@@ -0,0 +1,41 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson: тот же компактный вывод, но быстрее.
+    Без orjson или при запросе отступов работает как обычный JSONRenderer.
+    """
+
+    encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(
+                accepted_media_type or '', renderer_context or {}):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return orjson.dumps(
+            data,
+            default=self.encoder.default,
+            option=orjson.OPT_NON_STR_KEYS
+        )
+
+
+class FileFormatNegotiation(DefaultContentNegotiation):
+    """
+    Для действий, отдающих готовый файл: параметр format выбирает
+    формат файла, а не рендерер, поэтому ответы об ошибках всегда
+    отдаются первым рендерером.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
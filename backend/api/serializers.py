@@ -1,13 +1,56 @@
+from collections import defaultdict
+
 from rest_framework import serializers
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
 from drf_extra_fields.fields import Base64ImageField
+from django.conf import settings
 from django.db import transaction
 
 from recipes.models import Recipe, Tag, Ingredient, RecipeIngredient
-from users.models import User, Follow
-from .utils import process_ingredients
-
-
-class UserSerializer(serializers.ModelSerializer):
+from users.models import User
+from .fields import BulkPrimaryKeyRelatedField, BulkRelatedListSerializer
+from .utils import (
+    get_sparse_fields,
+    get_viewer_ids,
+    is_personal,
+    process_ingredients,
+    set_prefetched_objects)
+
+
+class PersonalFieldsMixin:
+    """Убирает personal_fields из ответа на запрос с personal=false."""
+
+    personal_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not is_personal(self.context.get('request')):
+            for name in self.personal_fields:
+                fields.pop(name, None)
+        return fields
+
+
+class SparseFieldsMixin:
+    """
+    Оставляет в ответе только поля из ?fields=. Связи из collapsed_fields,
+    не перечисленные в ?expand=, выводятся идентификаторами.
+    """
+
+    collapsed_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, expand = get_sparse_fields(self.context.get('request'))
+        for name in list(fields):
+            if requested is not None and name not in requested:
+                del fields[name]
+            elif (expand is not None and name in self.collapsed_fields
+                  and name not in expand):
+                fields[name] = self.collapsed_fields[name]()
+        return fields
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -16,10 +59,8 @@ class UserSerializer(serializers.ModelSerializer):
                   'last_name', 'is_subscribed', 'avatar')
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return Follow.objects.filter(user=user, author=obj).exists()
-        return False
+        return obj.id in get_viewer_ids(
+            self.context.get('request'), 'subscriptions')
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -89,7 +130,8 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
+        source='ingredient',
         queryset=Ingredient.objects.all()
     )
     name = serializers.ReadOnlyField(source='ingredient.name')
@@ -100,6 +142,50 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ['id', 'name', 'measurement_unit', 'amount', ]
+        list_serializer_class = BulkRelatedListSerializer
+
+
+class IngredientAmountSerializer(serializers.ModelSerializer):
+    """Ингредиент рецепта без раскрытия: id и количество."""
+    id = serializers.ReadOnlyField(source='ingredient_id')
+    amount = serializers.IntegerField()
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ['id', 'amount']
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетных операций."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.MAX_RECIPES_IN_BULK_REQUEST
+    )
+
+
+class MultiGetSerializer(serializers.Serializer):
+    """Список id из параметра ?ids= пакетного получения объектов."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.MAX_OBJECTS_IN_MULTI_GET
+    )
+
+
+class SyncQuerySerializer(serializers.Serializer):
+    """Параметры ленты изменений."""
+    cursor = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.SYNC_MAX_PAGE_SIZE,
+        default=settings.SYNC_PAGE_SIZE
+    )
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Параметры выгрузки каталога."""
+    after = serializers.IntegerField(min_value=0, default=0)
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -124,10 +210,7 @@ class SubscribeAuthorSerializer(serializers.ModelSerializer):
     username = serializers.ReadOnlyField()
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source='author_recipes.count',
-        read_only=True
-    )
+    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -143,20 +226,25 @@ class SubscribeAuthorSerializer(serializers.ModelSerializer):
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.author_recipes.all()
-        if limit:
-            recipes = recipes[:int(limit)]
+        # Список подписок подгружает рецепты с учётом recipes_limit
+        recipes = getattr(obj, 'page_recipes', None)
+        if recipes is None:
+            limit = request.GET.get('recipes_limit', '')
+            recipes = obj.author_recipes.all()
+            if limit.isdigit():
+                recipes = recipes[:int(limit)]
         serializer = ShoppingCartSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
+    def get_recipes_count(self, obj):
+        # В списке подписок количество приходит аннотацией
+        count = getattr(obj, 'recipes_count', None)
+        return obj.author_recipes.count() if count is None else count
+
     def get_is_subscribed(self, obj):
         # Проверяем, подписан ли текущий пользователь на данного автора
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Follow.objects.filter(user=request.user,
-                                         author=obj).exists()
-        return False
+        return obj.id in get_viewer_ids(
+            self.context.get('request'), 'subscriptions')
 
     def validate(self, obj):
         user = self.context['request'].user
@@ -170,7 +258,9 @@ class SubscribeAuthorSerializer(serializers.ModelSerializer):
         return obj
 
 
-class AuthorForRecipeSerializer(SubscribeAuthorSerializer):
+class AuthorForRecipeSerializer(PersonalFieldsMixin,
+                                SubscribeAuthorSerializer):
+    personal_fields = ('is_subscribed',)
 
     class Meta(SubscribeAuthorSerializer.Meta):
         fields = ('email',
@@ -182,7 +272,9 @@ class AuthorForRecipeSerializer(SubscribeAuthorSerializer):
                   'avatar')
 
 
-class ListRetrieveRecipeSerializer(serializers.ModelSerializer):
+class ListRetrieveRecipeSerializer(SparseFieldsMixin,
+                                   PersonalFieldsMixin,
+                                   serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(many=True,
                                              source='recipe_ingredients')
     tags = TagSerializer(many=True)
@@ -191,6 +283,16 @@ class ListRetrieveRecipeSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField(read_only=True)
 
+    personal_fields = ('is_favorited', 'is_in_shopping_cart')
+    collapsed_fields = {
+        'tags': lambda: serializers.PrimaryKeyRelatedField(
+            many=True, read_only=True),
+        'author': lambda: serializers.PrimaryKeyRelatedField(
+            read_only=True),
+        'ingredients': lambda: IngredientAmountSerializer(
+            many=True, source='recipe_ingredients'),
+    }
+
     class Meta:
         model = Recipe
         fields = [
@@ -207,24 +309,174 @@ class ListRetrieveRecipeSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        user = request.user if request else None
-        if user and user.is_authenticated:
-            return obj.favorites.filter(id=user.id).exists()
-        return False
+        return obj.id in get_viewer_ids(
+            self.context.get('request'), 'favorites')
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.shopping_recipe.filter(user=user).exists()
-        return False
+        return obj.id in get_viewer_ids(
+            self.context.get('request'), 'shopping_cart')
+
+
+class FastRecipeSerializer:
+    """
+    Быстрый read-only аналог ListRetrieveRecipeSerializer.
+    Теги, ингредиенты и авторы всей страницы читаются тремя запросами
+    values_list, а словари собираются напрямую, без полей DRF.
+    Вывод совпадает с ListRetrieveRecipeSerializer байт в байт.
+    Ключ контекста personal=False убирает персональные поля независимо
+    от параметров запроса.
+    """
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @property
+    def data(self):
+        recipes = list(self.instance) if self.many else [self.instance]
+        data = self.serialize(recipes)
+        if self.many:
+            return ReturnList(data, serializer=self)
+        return ReturnDict(data[0], serializer=self)
+
+    def file_url(self, model, field_name, name):
+        """Как FileField.to_representation у DRF: абсолютный URL или None."""
+        if not name:
+            return None
+        url = model._meta.get_field(field_name).storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_tags(self, recipe_ids, expand):
+        tags = defaultdict(list)
+        queryset = Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids).order_by('tag_id')
+        if not expand:
+            for recipe_id, tag_id in queryset.values_list(
+                    'recipe_id', 'tag_id'):
+                tags[recipe_id].append(tag_id)
+            return tags
+        for recipe_id, tag_id, name, slug in queryset.values_list(
+                'recipe_id', 'tag_id', 'tag__name', 'tag__slug'):
+            tags[recipe_id].append({'id': tag_id, 'name': name, 'slug': slug})
+        return tags
+
+    def get_ingredients(self, recipe_ids, expand):
+        ingredients = defaultdict(list)
+        queryset = RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids).order_by('id')
+        if not expand:
+            for recipe_id, ingredient_id, amount in queryset.values_list(
+                    'recipe_id', 'ingredient_id', 'amount'):
+                ingredients[recipe_id].append({
+                    'id': ingredient_id,
+                    'amount': None if amount is None else int(amount),
+                })
+            return ingredients
+        for recipe_id, ingredient_id, name, unit, amount in (
+                queryset.values_list(
+                    'recipe_id', 'ingredient_id', 'ingredient__name',
+                    'ingredient__measurement_unit', 'amount')):
+            ingredients[recipe_id].append({
+                'id': ingredient_id,
+                'name': name,
+                'measurement_unit': unit,
+                'amount': None if amount is None else int(amount),
+            })
+        return ingredients
+
+    def get_authors(self, author_ids, personal):
+        subscriptions = frozenset()
+        if personal:
+            subscriptions = get_viewer_ids(
+                self.context.get('request'), 'subscriptions')
+        authors = {}
+        for email, author_id, username, first_name, last_name, avatar in (
+                User.objects.filter(id__in=author_ids)
+                .values_list('email', 'id', 'username', 'first_name',
+                             'last_name', 'avatar')):
+            author = {
+                'email': email,
+                'id': author_id,
+                'username': username,
+                'first_name': first_name,
+                'last_name': last_name,
+                'is_subscribed': author_id in subscriptions,
+                'avatar': self.file_url(User, 'avatar', avatar),
+            }
+            if not personal:
+                del author['is_subscribed']
+            authors[author_id] = author
+        return authors
+
+    def serialize(self, recipes):
+        """
+        Собирает словари рецептов. Поля, не запрошенные в ?fields=,
+        не читаются из базы; связи без ?expand= выводятся id.
+        """
+        request = self.context.get('request')
+        personal = self.context.get('personal', is_personal(request))
+        fields, expand = get_sparse_fields(request)
+
+        def wanted(name):
+            return fields is None or name in fields
+
+        def expanded(name):
+            return expand is None or name in expand
+
+        recipe_ids = [recipe.id for recipe in recipes]
+        tags = ingredients = authors = None
+        if wanted('tags'):
+            tags = self.get_tags(recipe_ids, expanded('tags'))
+        if wanted('ingredients'):
+            ingredients = self.get_ingredients(
+                recipe_ids, expanded('ingredients'))
+        if wanted('author') and expanded('author'):
+            authors = self.get_authors(
+                {recipe.author_id for recipe in recipes}, personal)
+
+        favorites = shopping_cart = None
+        if personal and wanted('is_favorited'):
+            favorites = get_viewer_ids(request, 'favorites')
+        if personal and wanted('is_in_shopping_cart'):
+            shopping_cart = get_viewer_ids(request, 'shopping_cart')
+        with_name, with_image, with_text, with_cooking_time = (
+            wanted(name) for name in ('name', 'image', 'text', 'cooking_time'))
+
+        data = []
+        for recipe in recipes:
+            item = {'id': recipe.id}
+            if tags is not None:
+                item['tags'] = tags[recipe.id]
+            if authors is not None:
+                item['author'] = authors.get(recipe.author_id)
+            elif wanted('author'):
+                item['author'] = recipe.author_id
+            if ingredients is not None:
+                item['ingredients'] = ingredients[recipe.id]
+            if favorites is not None:
+                item['is_favorited'] = recipe.id in favorites
+            if shopping_cart is not None:
+                item['is_in_shopping_cart'] = recipe.id in shopping_cart
+            if with_name:
+                item['name'] = str(recipe.name)
+            if with_image:
+                item['image'] = self.file_url(
+                    Recipe, 'image', recipe.image.name)
+            if with_text:
+                item['text'] = str(recipe.text)
+            if with_cooking_time:
+                item['cooking_time'] = int(recipe.cooking_time)
+            data.append(item)
+        return data
 
 
 class CreateUpdateDeleteRecipeSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(many=True,
                                              source='recipe_ingredients')
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True)
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all(),
+                                      many=True)
     image = Base64ImageField()
     author = AuthorForRecipeSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField()
@@ -254,30 +506,25 @@ class CreateUpdateDeleteRecipeSerializer(serializers.ModelSerializer):
         }
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        user = request.user if request else None
-        if user and user.is_authenticated:
-            return obj.favorites.filter(id=user.id).exists()
-        return False
+        return obj.id in get_viewer_ids(
+            self.context.get('request'), 'favorites')
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        user = request.user if request else None
-        if user and user.is_authenticated:
-            return obj.shopping_recipe.filter(id=user.id).exists()
-        return False
+        return obj.id in get_viewer_ids(
+            self.context.get('request'), 'shopping_cart')
 
     def to_representation(self, instance):
         """
         Переопределение метода to_representation для того,
         чтобы вернуть теги с полными данными (например, name и slug).
+        После записи связи берутся из памяти, без повторных запросов.
         """
+        if getattr(self, '_written_relations', None):
+            # DRF сбрасывает кеш prefetch после update, восстанавливаем его
+            self._cache_relations(instance, *self._written_relations)
         representation = super().to_representation(instance)
-
-        tags_ids = representation.get('tags', [])
-        tags = Tag.objects.filter(id__in=tags_ids)
-        tag_serializer = TagSerializer(tags, many=True)
-        representation['tags'] = tag_serializer.data
+        representation['tags'] = TagSerializer(
+            instance.tags.all(), many=True).data
         return representation
 
     def validate(self, data):
@@ -289,7 +536,8 @@ class CreateUpdateDeleteRecipeSerializer(serializers.ModelSerializer):
                     {'ingredients': 'Список ингредиентов пуст.'}
                 )
         # Проверка на дублирование ингредиентов
-        ingredient_ids = [ingredient['id'] for ingredient in ingredients]
+        ingredient_ids = [
+            ingredient['ingredient'].id for ingredient in ingredients]
         if len(ingredient_ids) != len(set(ingredient_ids)):
             raise serializers.ValidationError(
                 {'ingredients': 'Ингредиенты не должны повторяться.'}
@@ -335,23 +583,19 @@ class CreateUpdateDeleteRecipeSerializer(serializers.ModelSerializer):
         # Извлекаем связанные данные
         ingredients_data = validated_data.pop('recipe_ingredients')
         tags_data = validated_data.pop('tags')
-        image_data = validated_data.pop('image')
 
         # Присваиваем автором текущего пользователя
         validated_data['author'] = self.context['request'].user
 
-        # Создаем рецепт
+        # Создаем рецепт вместе с изображением одним INSERT
         recipe = Recipe.objects.create(**validated_data)
 
-        # Связываем теги
-        recipe.tags.set(tags_data)
-
-        if image_data:
-            recipe.image = image_data
-            recipe.save()
-
-        process_ingredients(recipe, ingredients_data)
+        # Связываем теги и ингредиенты: у нового рецепта связей нет
+        recipe.tags.add(*tags_data)
+        recipe_ingredients = process_ingredients(
+            recipe, ingredients_data, existing={})
 
+        self._written_relations = (tags_data, recipe_ingredients)
         return recipe
 
     @transaction.atomic
@@ -359,13 +603,22 @@ class CreateUpdateDeleteRecipeSerializer(serializers.ModelSerializer):
         ingredients_data = validated_data.pop('recipe_ingredients', None)
         tags_data = validated_data.pop('tags')
 
-        instance.tags.clear()
+        # set() без clear() меняет только отличающиеся связи
         instance.tags.set(tags_data)
 
+        recipe_ingredients = None
         if ingredients_data is not None:
-            instance.recipe_ingredients.all().delete()
-            process_ingredients(instance, ingredients_data)
-
-        instance.save()
+            recipe_ingredients = process_ingredients(
+                instance, ingredients_data)
 
+        self._written_relations = (tags_data, recipe_ingredients)
         return super().update(instance, validated_data)
+
+    @staticmethod
+    def _cache_relations(recipe, tags, recipe_ingredients):
+        """Сохраняет записанные связи в кеше для ответа без запросов."""
+        set_prefetched_objects(
+            recipe, 'tags', sorted(tags, key=lambda tag: tag.id))
+        if recipe_ingredients is not None:
+            set_prefetched_objects(
+                recipe, 'recipe_ingredients', recipe_ingredients)
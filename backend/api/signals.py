@@ -0,0 +1,166 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from recipes.changelog import log_changes, touch_recipes
+from recipes.models import (ChangeLog, Ingredient, Recipe, RecipeIngredient,
+                            Tag)
+from .cache import INGREDIENTS, RECIPES, TAGS, USERS, invalidate
+from .purgers import purge
+from .snapshots import schedule
+
+User = get_user_model()
+# Поля пользователя, которые отдаёт API, в том числе внутри рецептов
+PUBLIC_FIELDS = ('email', 'username', 'first_name', 'last_name', 'avatar')
+
+
+def recipe_ids(**filters):
+    return list(Recipe.objects.filter(**filters).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    invalidate(RECIPES)
+    purge(f'recipe-{instance.pk}', 'recipes')
+    schedule(recipe_ids=[instance.pk])
+    log_changes(ChangeLog.RECIPE, [instance.pk])
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    # После удаления связи с тегами уже не найти, а списки по ним устареют
+    schedule(tag_ids=instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    invalidate(RECIPES)
+    purge(f'recipe-{instance.pk}', 'recipes')
+    schedule(recipe_ids=[instance.pk])
+    log_changes(ChangeLog.RECIPE, [instance.pk], ChangeLog.DELETE)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    invalidate(RECIPES)
+    purge(f'recipe-{instance.recipe_id}', 'recipes')
+    schedule(recipe_ids=[instance.recipe_id])
+    touch_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    invalidate(RECIPES)
+    changed_ids = (pk_set or ()) if reverse else (instance.pk,)
+    purge('recipes', *(f'recipe-{pk}' for pk in changed_ids))
+    # Убранные теги: рецепт пропал из их списков
+    tag_ids = (instance.pk,) if reverse else (pk_set or ())
+    schedule(recipe_ids=changed_ids, tag_ids=tag_ids)
+    touch_recipes(changed_ids)
+
+
+@receiver(pre_save, sender=Tag)
+def tag_saving(sender, instance, **kwargs):
+    if settings.SNAPSHOTS_ENABLED and instance.pk:
+        instance.saved_slug = Tag.objects.filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    invalidate(TAGS, RECIPES)
+    purge(f'tag-{instance.pk}', 'tags')
+    log_changes(ChangeLog.TAG, [instance.pk])
+    changed_ids = [] if created else recipe_ids(tags=instance)
+    touch_recipes(changed_ids)
+    # Страницы по старому слагу теперь отвечают 400, и их снимки
+    # удаляются при перерисовке
+    tag_slugs = {instance.slug, getattr(instance, 'saved_slug', None)}
+    schedule(recipe_ids=changed_ids, tag_slugs=tag_slugs - {None})
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(sender, instance, **kwargs):
+    # Связи с рецептами удаляются каскадом, без сигналов m2m_changed
+    changed_ids = recipe_ids(tags=instance)
+    touch_recipes(changed_ids)
+    schedule(recipe_ids=changed_ids)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    invalidate(TAGS, RECIPES)
+    purge(f'tag-{instance.pk}', 'tags')
+    log_changes(ChangeLog.TAG, [instance.pk], ChangeLog.DELETE)
+    schedule(tag_slugs=[instance.slug])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    invalidate(INGREDIENTS, RECIPES)
+    purge(f'ingredient-{instance.pk}', 'ingredients', 'recipes')
+    log_changes(ChangeLog.INGREDIENT, [instance.pk])
+    if not created:
+        changed_ids = recipe_ids(recipe_ingredients__ingredient=instance)
+        touch_recipes(changed_ids)
+        schedule(recipe_ids=changed_ids)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleting(sender, instance, **kwargs):
+    changed_ids = recipe_ids(recipe_ingredients__ingredient=instance)
+    touch_recipes(changed_ids)
+    schedule(recipe_ids=changed_ids)
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    invalidate(INGREDIENTS, RECIPES)
+    purge(f'ingredient-{instance.pk}', 'ingredients', 'recipes')
+    log_changes(ChangeLog.INGREDIENT, [instance.pk], ChangeLog.DELETE)
+
+
+def public_values(user):
+    """Публичные поля в том виде, в каком их пишет в базу save()."""
+    return tuple(
+        User._meta.get_field(field).get_prep_value(getattr(user, field))
+        for field in PUBLIC_FIELDS
+    )
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login: сверять нечего
+    if not instance.pk or (
+            update_fields and not set(update_fields) & set(PUBLIC_FIELDS)):
+        return
+    instance.saved_public = User.objects.filter(
+        pk=instance.pk).values_list(*PUBLIC_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # Новый пользователь ещё нигде не показан, а пароль, last_login
+    # и права в ответы не попадают
+    saved = instance.__dict__.pop('saved_public', None)
+    if created or saved is None or saved == public_values(instance):
+        return
+    invalidate(USERS)
+    purge(f'author-{instance.pk}')
+    # Рецепты содержат публичные поля автора. Дата изменения тоже:
+    # по ней отвечает If-Modified-Since
+    changed_ids = recipe_ids(author=instance)
+    touch_recipes(changed_ids)
+    schedule(recipe_ids=changed_ids)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # Рецепты автора удаляются каскадом, каждый со своим сигналом
+    invalidate(USERS)
+    purge(f'author-{instance.pk}')
@@ -0,0 +1,243 @@
+import logging
+import os
+import tempfile
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipes.models import Recipe, Tag
+from .models import SnapshotTask
+from .pagination import CustomPagination
+from .renderers import FastJSONRenderer
+from .serializers import FastRecipeSerializer
+from .views import RecipeViewSet
+
+logger = logging.getLogger(__name__)
+
+RECIPES_PATH = '/api/recipes/'
+RECIPES_BATCH_SIZE = 500
+TASKS_BATCH_SIZE = 1000
+
+_pending = threading.local()
+
+
+def snapshot_root():
+    return Path(settings.MEDIA_ROOT) / 'snapshots' / 'recipes'
+
+
+def detail_path(recipe_id):
+    return snapshot_root() / f'{recipe_id}.json'
+
+
+def list_path(query):
+    """Файл страницы списка; имя совпадает со строкой запроса."""
+    return snapshot_root() / 'list' / f'{query or "index"}.json'
+
+
+def list_queries(tag_slug=None):
+    """
+    Строки запроса первых страниц списка в том виде, в каком
+    их отправляет фронтенд: page, limit и, для тега, tags.
+    """
+    queries = [] if tag_slug else ['']
+    for page in range(1, settings.SNAPSHOT_LIST_PAGES + 1):
+        query = f'page={page}&limit={CustomPagination.page_size}'
+        if tag_slug:
+            query += f'&tags={tag_slug}'
+        queries.append(query)
+    return queries
+
+
+def make_request(path):
+    """Анонимный GET-запрос к адресу сайта, как его видит бэкенд."""
+    return APIRequestFactory().get(
+        path,
+        HTTP_HOST=settings.SNAPSHOT_HOST,
+        secure=settings.SNAPSHOT_SECURE
+    )
+
+
+def write_file(path, content):
+    """Пишет файл атомарно: nginx не увидит его наполовину записанным."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as file:
+        file.write(content)
+    os.chmod(temp_name, 0o644)
+    os.replace(temp_name, path)
+
+
+def remove_file(path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def publish_recipes(recipe_ids):
+    """
+    Перерисовывает снимки рецептов пачками: на пачку уходит столько же
+    запросов, сколько на одну страницу списка. Снимки удалённых
+    рецептов удаляются.
+    """
+    recipe_ids = sorted(set(recipe_ids))
+    renderer = FastJSONRenderer()
+    context = {'request': Request(make_request(RECIPES_PATH))}
+    for start in range(0, len(recipe_ids), RECIPES_BATCH_SIZE):
+        batch = recipe_ids[start:start + RECIPES_BATCH_SIZE]
+        recipes = Recipe.objects.filter(pk__in=batch).order_by('id')
+        data = FastRecipeSerializer(recipes, many=True, context=context).data
+        for item in data:
+            write_file(detail_path(item['id']), renderer.render(item))
+        for recipe_id in set(batch) - {item['id'] for item in data}:
+            remove_file(detail_path(recipe_id))
+
+
+def publish_list(query):
+    """Перерисовывает страницу списка через RecipeViewSet."""
+    path = f'{RECIPES_PATH}?{query}' if query else RECIPES_PATH
+    response = RecipeViewSet.as_view({'get': 'list'})(make_request(path))
+    if response.status_code == 200:
+        write_file(list_path(query), response.render().content)
+    else:
+        # Несуществующая страница или тег: запрос уйдёт в бэкенд
+        remove_file(list_path(query))
+
+
+def publish_lists(tag_slugs):
+    """Страницы общего списка и списков по каждому из тегов."""
+    for tag_slug in [None, *sorted(tag_slugs)]:
+        for query in list_queries(tag_slug):
+            publish_list(query)
+
+
+def publish(recipe_ids=(), tag_ids=(), tag_slugs=()):
+    """
+    Обновляет снимки изменившихся рецептов и списков, в которых
+    они могли оказаться: общего и по тегам рецептов.
+    """
+    tag_slugs = set(tag_slugs)
+    if recipe_ids or tag_ids:
+        tag_slugs.update(Tag.objects.filter(
+            Q(pk__in=tag_ids) | Q(recipe__in=recipe_ids)
+        ).values_list('slug', flat=True))
+    publish_recipes(recipe_ids)
+    publish_lists(tag_slugs)
+
+
+def publish_pending(limit=TASKS_BATCH_SIZE):
+    """
+    Выполняет накопленные задачи SnapshotTask одним проходом: рецепт,
+    изменённый в нескольких транзакциях, перерисовывается один раз.
+    За проход берётся не больше limit задач; возвращает их число.
+    """
+    tasks = list(SnapshotTask.objects.all()[:limit])
+    if not tasks:
+        return 0
+    recipe_ids, tag_ids, tag_slugs = set(), set(), set()
+    for task in tasks:
+        recipe_ids.update(task.recipe_ids)
+        tag_ids.update(task.tag_ids)
+        tag_slugs.update(task.tag_slugs)
+    publish(recipe_ids, tag_ids, tag_slugs)
+    SnapshotTask.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+    return len(tasks)
+
+
+class Batch:
+    """
+    Изменения одной транзакции. После фиксации записываются задачей
+    в очередь: перерисовка снимков не задерживает ответ пользователю.
+    """
+
+    def __init__(self):
+        self.recipe_ids = set()
+        self.tag_ids = set()
+        self.tag_slugs = set()
+
+    def add(self, recipe_ids, tag_ids, tag_slugs):
+        self.recipe_ids.update(recipe_ids)
+        self.tag_ids.update(tag_ids)
+        self.tag_slugs.update(tag_slugs)
+
+    def __call__(self):
+        _pending.batch = None
+        SnapshotTask.objects.create(
+            recipe_ids=sorted(self.recipe_ids),
+            tag_ids=sorted(self.tag_ids),
+            tag_slugs=sorted(self.tag_slugs)
+        )
+
+
+def schedule(recipe_ids=(), tag_ids=(), tag_slugs=()):
+    """
+    Копит изменения текущей транзакции и ставит их в очередь одной
+    задачей после её фиксации, сколько бы сигналов ни пришло.
+    """
+    if not settings.SNAPSHOTS_ENABLED:
+        return
+    # Пакет держит только колбэк on_commit: при откате транзакции
+    # Django его выбрасывает, слабая ссылка пустеет, и изменения
+    # отменённой транзакции не попадают в следующую
+    reference = getattr(_pending, 'batch', None)
+    batch = reference() if reference else None
+    if batch is not None:
+        batch.add(recipe_ids, tag_ids, tag_slugs)
+        return
+    batch = Batch()
+    _pending.batch = weakref.ref(batch)
+    # Вне транзакции колбэк выполняется сразу, пакет заполняется до него
+    batch.add(recipe_ids, tag_ids, tag_slugs)
+    transaction.on_commit(batch)
+
+
+def rebuild(workers=1, batch_size=RECIPES_BATCH_SIZE):
+    """
+    Полная пересборка: все рецепты пачками по batch_size и списки
+    по всем тегам, в workers потоков. Снимки удалённых рецептов
+    и тегов удаляются, очередь задач до начала пересборки — тоже.
+    Возвращает число рецептов и страниц списков.
+    """
+    last_task = SnapshotTask.objects.order_by('-id').values_list(
+        'id', flat=True).first()
+    recipe_ids = list(Recipe.objects.order_by('id').values_list(
+        'id', flat=True))
+    queries = [
+        query
+        for tag_slug in [None, *Tag.objects.order_by('slug').values_list(
+            'slug', flat=True)]
+        for query in list_queries(tag_slug)
+    ]
+
+    def run(task, *args):
+        try:
+            task(*args)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(run, publish_recipes,
+                            recipe_ids[start:start + batch_size])
+            for start in range(0, len(recipe_ids), batch_size)
+        ]
+        futures += [executor.submit(run, publish_list, query)
+                    for query in queries]
+        for future in futures:
+            future.result()
+
+    expected = {detail_path(recipe_id) for recipe_id in recipe_ids}
+    expected.update(list_path(query) for query in queries)
+    for path in snapshot_root().rglob('*.json'):
+        if path not in expected:
+            path.unlink()
+    if last_task is not None:
+        SnapshotTask.objects.filter(id__lte=last_task).delete()
+    return len(recipe_ids), len(queries)
@@ -0,0 +1,65 @@
+import re
+import uuid
+from urllib.parse import quote
+
+import django
+
+FRAMEWORK = f'django:{django.get_version()}'
+re_request_id = re.compile(r'^[\w.-]{1,64}$')
+
+
+def get_request_id(request):
+    """
+    Id запроса из X-Request-ID (его ставит nginx) или новый. Чужое
+    значение берётся только безопасного вида: оно попадёт в SQL.
+    """
+    request_id = request.headers.get('X-Request-ID', '')
+    if re_request_id.match(request_id):
+        return request_id
+    return uuid.uuid4().hex
+
+
+class SqlCommenter:
+    """
+    Обёртка execute_wrapper: дописывает к SQL комментарий в формате
+    sqlcommenter с маршрутом, viewset, действием и id запроса.
+    Комментарий строится один раз, когда маршрут уже известен.
+    """
+
+    def __init__(self, request, request_id):
+        self.request = request
+        self.request_id = request_id
+        self.comment = None
+
+    def build_comment(self):
+        match = self.request.resolver_match
+        tags = {
+            'framework': FRAMEWORK,
+            'request_id': self.request_id,
+            'route': match.route,
+        }
+        view = match.func
+        view_class = getattr(view, 'cls', None) or getattr(
+            view, 'view_class', None)
+        tags['controller'] = (
+            view_class.__name__ if view_class else view.__name__)
+        actions = getattr(view, 'actions', None)
+        if actions:
+            tags['action'] = actions.get(
+                self.request.method.lower(), 'unknown')
+        pairs = ','.join(
+            f"{key}='{quote(str(value), safe='')}'"
+            for key, value in sorted(tags.items()))
+        return f' /*{pairs}*/'
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.comment is None:
+            if getattr(self.request, 'resolver_match', None) is None:
+                # Запросы до разрешения URL (сессии) идут без комментария
+                return execute(sql, params, many, context)
+            self.comment = self.build_comment()
+        comment = self.comment
+        if params is not None:
+            # Драйвер подставит параметры через %, проценты экранируем
+            comment = comment.replace('%', '%%')
+        return execute(sql + comment, params, many, context)
@@ -0,0 +1,40 @@
+import json
+import math
+import platform
+from datetime import datetime, timezone
+
+
+def percentile(sorted_values, share):
+    """Перцентиль по методу ближайшего ранга; значения уже отсортированы."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(share * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(durations):
+    """Сводка по длительностям в секундах; в отчёте — миллисекунды."""
+    values = sorted(durations)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3),
+        'min_ms': round(values[0] * 1000, 3),
+        'p50_ms': round(percentile(values, 0.5) * 1000, 3),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3),
+    }
+
+
+def write_report(path, report):
+    """Сохраняет отчёт в JSON вместе с данными о машине и времени запуска."""
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.node(),
+        **report,
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,75 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from carts.models import ShoppingCart
+from recipes.models import Recipe
+from users.models import Follow
+
+from .utils import create_recipe, create_user, token_client
+
+MISSING_ID = 10 ** 6
+
+
+class AddRemoveTests(TestCase):
+    """Избранное, список покупок и подписки: добавление и удаление."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.author = create_user('author')
+        cls.recipe = create_recipe(cls.author)
+
+    def setUp(self):
+        self.client = token_client(self.user)
+
+    def cases(self):
+        return (
+            ('/api/recipes/{}/favorite/', self.recipe.id,
+             Recipe.favorites.through.objects.filter(
+                 user=self.user, recipe=self.recipe)),
+            ('/api/recipes/{}/shopping_cart/', self.recipe.id,
+             ShoppingCart.objects.filter(user=self.user, recipe=self.recipe)),
+            ('/api/users/{}/subscribe/', self.author.id,
+             Follow.objects.filter(user=self.user, author=self.author)),
+        )
+
+    def test_add_and_duplicate(self):
+        for url, object_id, rows in self.cases():
+            with self.subTest(url=url):
+                response = self.client.post(url.format(object_id))
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(response.data['id'], object_id)
+                response = self.client.post(url.format(object_id))
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(rows.count(), 1)
+
+    def test_remove(self):
+        for url, object_id, rows in self.cases():
+            with self.subTest(url=url):
+                self.client.post(url.format(object_id))
+                response = self.client.delete(url.format(object_id))
+                self.assertEqual(response.status_code, 204)
+                self.assertFalse(rows.exists())
+                # Повторное удаление: объекта в списке уже нет
+                response = self.client.delete(url.format(object_id))
+                self.assertEqual(response.status_code, 400)
+
+    def test_missing_object(self):
+        for url, _, rows in self.cases():
+            with self.subTest(url=url):
+                for method in (self.client.post, self.client.delete):
+                    response = method(url.format(MISSING_ID))
+                    self.assertEqual(response.status_code, 404)
+                self.assertFalse(rows.exists())
+
+    def test_add_without_savepoint(self):
+        # Повтор находит проверка, а не откат неудачного INSERT
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        for status_code in (201, 400):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url)
+            self.assertEqual(response.status_code, status_code)
+            self.assertFalse([
+                query for query in queries.captured_queries
+                if 'SAVEPOINT' in query['sql']])
@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.test import TestCase
+
+from carts.models import ShoppingCart
+from recipes.models import Recipe
+
+from .utils import create_recipe, create_user, token_client
+
+MISSING_ID = 10 ** 6
+
+
+class BulkRecipesTests(TestCase):
+    """Пакетные избранное и список покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.other = create_user('other')
+        author = create_user('author')
+        cls.recipes = [
+            create_recipe(author, name=f'Рецепт {n}') for n in range(3)]
+        cls.ids = [recipe.id for recipe in cls.recipes]
+
+    def setUp(self):
+        self.client = token_client(self.user)
+
+    def cases(self):
+        return (
+            ('/api/recipes/favorite/', Recipe.favorites.through),
+            ('/api/recipes/shopping_cart/', ShoppingCart),
+        )
+
+    def request(self, method, url, recipe_ids, status_code=200):
+        response = getattr(self.client, method)(
+            url, {'recipes': recipe_ids}, format='json')
+        self.assertEqual(response.status_code, status_code, response.data)
+        return response.data
+
+    def statuses(self, data):
+        return [(item['id'], item['status']) for item in data['results']]
+
+    def test_limit(self):
+        limit = settings.MAX_RECIPES_IN_BULK_REQUEST
+        too_many = list(range(1, limit + 2))
+        for url, _ in self.cases():
+            for method in ('post', 'delete'):
+                with self.subTest(url=url, method=method):
+                    data = self.request(method, url, too_many, 400)
+                    self.assertIn('recipes', data)
+                    self.request(method, url, [], 400)
+                    self.request(method, url, too_many[:limit])
+
+    def test_add_unknown_and_duplicates(self):
+        first, second, _ = self.ids
+        for url, model in self.cases():
+            with self.subTest(url=url):
+                self.request('post', url, [first])
+                data = self.request(
+                    'post', url, [second, first, MISSING_ID, second])
+                self.assertEqual(self.statuses(data), [
+                    (second, 'added'),
+                    (first, 'exists'),
+                    (MISSING_ID, 'not_found'),
+                ])
+                self.assertEqual(sorted(model.objects.filter(
+                    user=self.user).values_list('recipe_id', flat=True)),
+                    [first, second])
+
+    def test_remove_missing_ids(self):
+        first, second, third = self.ids
+        for url, model in self.cases():
+            with self.subTest(url=url):
+                model.objects.create(user=self.user, recipe_id=first)
+                model.objects.create(user=self.other, recipe_id=second)
+                data = self.request(
+                    'delete', url, [first, second, first, MISSING_ID])
+                self.assertEqual(self.statuses(data), [
+                    (first, 'removed'),
+                    (second, 'not_found'),
+                    (MISSING_ID, 'not_found'),
+                ])
+                self.assertFalse(model.objects.filter(
+                    user=self.user).exists())
+                # Чужой список не меняется
+                self.assertTrue(model.objects.filter(
+                    user=self.other, recipe_id=second).exists())
+
+    def test_clear_shopping_cart(self):
+        url = '/api/recipes/shopping_cart/clear/'
+        ShoppingCart.objects.bulk_create([
+            ShoppingCart(user=self.user, recipe_id=recipe_id)
+            for recipe_id in reversed(self.ids)
+        ] + [ShoppingCart(user=self.other, recipe_id=self.ids[0])])
+        data = self.request('delete', url, None)
+        self.assertEqual(self.statuses(data),
+                         [(recipe_id, 'removed') for recipe_id in self.ids])
+        self.assertFalse(ShoppingCart.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            ShoppingCart.objects.filter(user=self.other).count(), 1)
+        # Пустой список покупок
+        self.assertEqual(self.request('delete', url, None)['results'], [])
@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.cache import RECIPES, USERS, get_versions
+
+from .utils import create_recipe, create_user, token_client
+
+
+class AnonymousCacheTests(TestCase):
+    """Общий кеш ответов не отдаёт одному пользователю данные другого."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = create_user('first')
+        cls.second = create_user('second')
+        author = create_user('author')
+        cls.recipe = create_recipe(author)
+        create_recipe(author, name='Другой рецепт')
+        cls.recipe.favorites.add(cls.first)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_user_filters_are_not_shared(self):
+        url = '/api/recipes/?is_favorited=1&personal=false'
+        first = token_client(self.first).get(url)
+        second = token_client(self.second).get(url)
+        self.assertEqual(first.data['count'], 1)
+        self.assertEqual(second.data['count'], 0)
+        for response in (first, second):
+            self.assertNotIn('public', response['Cache-Control'])
+            self.assertIn('private', response['Cache-Control'])
+
+    def test_shared_response_without_user_filters(self):
+        url = '/api/recipes/?personal=false'
+        first = token_client(self.first).get(url)
+        second = token_client(self.second).get(url)
+        self.assertIn('public', first['Cache-Control'])
+        self.assertEqual(first.data, second.data)
+
+    def test_versions_change_after_commit(self):
+        client = APIClient()
+        url = f'/api/recipes/{self.recipe.id}/'
+        client.get(url)
+        versions = get_versions([RECIPES])
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.recipe.name = 'Новое название'
+            self.recipe.save()
+            # До фиксации ответ из кеша ещё под старой версией
+            self.assertEqual(get_versions([RECIPES]), versions)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_versions([RECIPES]), versions)
+        self.assertEqual(client.get(url).data['name'], 'Новое название')
+
+
+class UserInvalidationTests(TestCase):
+    """Кеш пользователей сбрасывают только изменения публичных полей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+
+    def setUp(self):
+        cache.clear()
+
+    def assertUsersInvalidated(self, change, expected=True):
+        versions = get_versions([USERS])
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertEqual(get_versions([USERS]) != versions, expected)
+
+    def test_public_field_change_invalidates(self):
+        def rename():
+            self.user.first_name = 'Новое имя'
+            self.user.save()
+        self.assertUsersInvalidated(rename)
+
+    def test_private_changes_keep_cache(self):
+        def change_password():
+            self.user.set_password('new-password-123')
+            self.user.save()
+
+        def login():
+            self.user.last_login = timezone.now()
+            self.user.save(update_fields=['last_login'])
+
+        def save_unchanged():
+            self.user.save()
+
+        for change in (change_password, login, save_unchanged,
+                       lambda: create_user('newcomer')):
+            with self.subTest(change=change):
+                self.assertUsersInvalidated(change, expected=False)
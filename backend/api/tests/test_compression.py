@@ -0,0 +1,27 @@
+from unittest import skipIf
+
+from django.test import TestCase
+
+from api.middleware import brotli
+
+from .utils import create_ingredients
+
+
+@skipIf(brotli is None, 'brotli не установлен')
+class CompressionTests(TestCase):
+    """brotli только для JSON; HTML сжимается gzip с защитой от BREACH."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_ingredients(100)
+
+    def test_json_uses_brotli(self):
+        response = self.client.get(
+            '/api/ingredients/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+    def test_html_uses_gzip(self):
+        response = self.client.get(
+            '/admin/login/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
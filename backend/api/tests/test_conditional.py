@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+
+from .utils import create_ingredients, create_recipe, create_tags, create_user
+
+# Без проверки валидаторов: COUNT, страница, теги, ингредиенты, авторы
+LIST_QUERIES = 5
+
+
+class ConditionalGetTests(TestCase):
+    """ETag и Last-Modified рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        tags = create_tags(2)
+        ingredients = create_ingredients(2)
+        for n in range(8):
+            create_recipe(cls.author, name=f'Рецепт {n}', tags=tags,
+                          ingredients=[(ingredient, n + 1)
+                                       for ingredient in ingredients])
+        cls.recipe = Recipe.objects.order_by('id').first()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_author_change_bumps_last_modified(self):
+        past = timezone.now() - timedelta(hours=1)
+        Recipe.objects.update(updated=past)
+        url = f'/api/recipes/{self.recipe.id}/'
+        response = self.client.get(url)
+        self.assertEqual(response['Last-Modified'], http_date(
+            int(past.timestamp())))
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        ).status_code, 304)
+
+        self.author.first_name = 'Новое имя'
+        self.author.save()
+        cache.clear()
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['author']['first_name'], 'Новое имя')
+
+    def test_list_reads_page_once(self):
+        with self.assertNumQueries(LIST_QUERIES):
+            response = self.client.get('/api/recipes/?limit=6')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 6)
+        cache.clear()
+        response = self.client.get(
+            '/api/recipes/?limit=6', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,88 @@
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Prefetch
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import FastRecipeSerializer, ListRetrieveRecipeSerializer
+from carts.models import ShoppingCart
+from recipes.models import Recipe, RecipeIngredient, Tag
+from users.models import Follow
+
+from .utils import create_ingredients, create_recipe, create_tags, create_user
+
+QUERIES = (
+    {},
+    {'personal': 'false'},
+    {'fields': 'name,image,cooking_time,author', 'expand': 'author'},
+    {'fields': 'tags,ingredients,author'},
+    {'expand': 'tags'},
+)
+
+
+class FastRecipeSerializerTests(TestCase):
+    """
+    FastRecipeSerializer отдаёт те же байты JSON, что и
+    ListRetrieveRecipeSerializer, для любых зрителей и параметров.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = create_tags(3)
+        ingredients = create_ingredients(4)
+        author = create_user('author')
+        author.avatar = 'users/avatars/author.png'
+        author.save()
+        plain_author = create_user('plain')
+        full = create_recipe(
+            author, name='Полный', tags=tags[1:],
+            ingredients=[(ingredients[2], 30), (ingredients[0], 5)])
+        create_recipe(plain_author, name='Пустой')
+        other = create_recipe(
+            plain_author, name='Ещё', tags=tags[:1],
+            ingredients=[(ingredients[3], None)])
+
+        cls.viewer = create_user('viewer')
+        full.favorites.add(cls.viewer)
+        ShoppingCart.objects.create(user=cls.viewer, recipe=other)
+        Follow.objects.create(user=cls.viewer, author=author)
+        cls.newcomer = create_user('newcomer')
+
+    def make_request(self, user, query):
+        request = Request(APIRequestFactory().get('/api/recipes/', query))
+        request.user = user
+        return request
+
+    def render_both(self, user, query, many=True):
+        queryset = Recipe.objects.order_by('id')
+        prefetched = queryset.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch('recipe_ingredients',
+                     queryset=RecipeIngredient.objects.select_related(
+                         'ingredient').order_by('id')))
+        if not many:
+            queryset, prefetched = queryset.first(), prefetched.first()
+        renderer = JSONRenderer()
+        return (
+            renderer.render(ListRetrieveRecipeSerializer(
+                prefetched, many=many,
+                context={'request': self.make_request(user, query)}).data),
+            renderer.render(FastRecipeSerializer(
+                queryset, many=many,
+                context={'request': self.make_request(user, query)}).data),
+        )
+
+    def test_same_bytes(self):
+        for user in (AnonymousUser(), self.viewer, self.newcomer):
+            for query in QUERIES:
+                for many in (True, False):
+                    with self.subTest(user=str(user), query=query, many=many):
+                        expected, actual = self.render_both(user, query, many)
+                        self.assertEqual(actual, expected)
+
+    def test_viewer_flags_are_rendered(self):
+        _, data = self.render_both(self.viewer, {})
+        self.assertIn(b'"is_favorited":true', data)
+        self.assertIn(b'"is_in_shopping_cart":true', data)
+        self.assertIn(b'"is_subscribed":true', data)
@@ -0,0 +1,17 @@
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+
+class ImportRecipesTests(TestCase):
+
+    def test_broken_json_array(self):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.json', encoding='utf-8') as file:
+            file.write('[\n  {"name": "Суп",}\n]')
+            file.flush()
+            with self.assertRaisesMessage(
+                    CommandError, 'строка 2, столбец 18'):
+                call_command('import_recipes', file.name, '--workers', '0')
@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .utils import (create_ingredients, create_recipe, create_tags,
+                    create_user, png_data_url, token_client)
+
+
+class FilePurgerTests(TestCase):
+    """Ключи, которые сбрасывает шлюз после изменений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.tags = create_tags(2)
+        cls.ingredients = create_ingredients(2)
+        cls.recipe = create_recipe(
+            cls.author, tags=cls.tags[:1],
+            ingredients=[(cls.ingredients[0], 5)])
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.purge_file = Path(directory) / 'purged_keys.log'
+        purger = override_settings(
+            CACHE_PURGER='api.purgers.FilePurger',
+            CACHE_PURGE_FILE=self.purge_file, MEDIA_ROOT=directory)
+        purger.enable()
+        self.addCleanup(purger.disable)
+
+    def purged_keys(self, change):
+        """Ключи из файла; до фиксации транзакции файл не пишется."""
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+            self.assertFalse(self.purge_file.exists())
+        lines = self.purge_file.read_text(encoding='utf-8').splitlines()
+        for line in lines:
+            self.assertEqual(line.split(), sorted(set(line.split())))
+        return {key for line in lines for key in line.split()}
+
+    def response_keys(self):
+        response = APIClient().get(f'/api/recipes/{self.recipe.id}/')
+        return set(response['Surrogate-Key'].split())
+
+    def test_recipe_update(self):
+        cached = self.response_keys()
+
+        def update():
+            response = token_client(self.author).patch(
+                f'/api/recipes/{self.recipe.id}/', {
+                    'name': 'Новое название',
+                    'text': 'Описание',
+                    'cooking_time': 15,
+                    'image': png_data_url(),
+                    'tags': [self.tags[1].id],
+                    'ingredients': [
+                        {'id': self.ingredients[1].id, 'amount': 10}],
+                }, format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+
+        keys = self.purged_keys(update)
+        self.assertTrue({f'recipe-{self.recipe.id}', 'recipes'} <= keys)
+        # Закешированный в шлюзе ответ рецепта попадает под сброс
+        self.assertIn(f'recipe-{self.recipe.id}', cached & keys)
+
+    def test_tag_rename(self):
+        tag = self.tags[0]
+        cached = self.response_keys()
+
+        def rename():
+            tag.name = 'Новое имя'
+            tag.save()
+
+        keys = self.purged_keys(rename)
+        self.assertEqual(keys, {f'tag-{tag.id}', 'tags'})
+        self.assertEqual(cached & keys, {f'tag-{tag.id}'})
@@ -0,0 +1,149 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.queries import (QueryBudgetExceeded, QueryRecorder, check_queries,
+                         query_shape)
+from carts.models import ShoppingCart
+from recipes.models import Recipe
+from users.models import Follow
+
+from .utils import create_ingredients, create_recipe, create_tags, create_user
+
+STRICT = {
+    'QUERY_INSPECTOR_ENABLED': True,
+    'QUERY_INSPECTOR_STRICT': True,
+    'CACHES': {'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+}
+
+
+class QueryShapeTests(TestCase):
+
+    def test_in_lists_collapse(self):
+        self.assertEqual(
+            query_shape('SELECT id FROM t WHERE id IN (%s, %s, %s)'),
+            query_shape('SELECT id FROM t WHERE id IN (%s)'))
+        self.assertEqual(
+            query_shape('SELECT id FROM t WHERE id IN (%s, %s)'),
+            'SELECT id FROM t WHERE id IN (...)')
+
+    def test_values_collapse(self):
+        self.assertEqual(
+            query_shape('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+            query_shape('INSERT INTO t (a, b) VALUES (%s, %s)'
+                        ', (%s, %s), (%s, %s)'))
+
+    def test_different_queries_differ(self):
+        self.assertNotEqual(
+            query_shape('SELECT id FROM t WHERE id = %s'),
+            query_shape('SELECT id FROM t WHERE name = %s'))
+
+
+class QueryRecorderTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.recipes = [
+            create_recipe(author, name=f'Рецепт {n}') for n in range(6)]
+
+    def record(self, function):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            function()
+        return recorder
+
+    def test_repeated_query_is_reported(self):
+        recorder = self.record(lambda: [
+            Recipe.objects.get(pk=recipe.pk) for recipe in self.recipes])
+        self.assertEqual(len(recorder.queries), 6)
+        repeated = recorder.repeated(5)
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(len(repeated[0]), 6)
+        self.assertEqual(recorder.repeated(7), [])
+
+    def test_in_lists_of_any_length_repeat(self):
+        recorder = self.record(lambda: [
+            list(Recipe.objects.filter(pk__in=[
+                recipe.pk for recipe in self.recipes[:size]]))
+            for size in range(1, 6)])
+        self.assertEqual(len(recorder.repeated(5)), 1)
+
+    def test_strict_breach_raises(self):
+        recorder = self.record(lambda: [
+            Recipe.objects.get(pk=recipe.pk) for recipe in self.recipes])
+        with override_settings(QUERY_INSPECTOR_STRICT=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                check_queries(recorder, 'test')
+            with self.assertRaises(QueryBudgetExceeded):
+                check_queries(self.record(lambda: None), 'test', budget=-1)
+        # Без строгого режима нарушение только пишется в лог
+        with self.assertLogs('api.queries', 'WARNING'):
+            check_queries(recorder, 'test')
+
+
+@override_settings(**STRICT)
+class QueryBudgetTests(TestCase):
+    """
+    Эндпоинты с @query_budget в строгом режиме: превышение бюджета
+    или N+1 — исключение, которое тестовый клиент пробрасывает в тест.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('viewer')
+        tags = create_tags(3)
+        ingredients = create_ingredients(5)
+        cls.recipes = []
+        for n in range(8):
+            author = create_user(f'author{n}')
+            Follow.objects.create(user=cls.viewer, author=author)
+            for m in range(n % 4):
+                recipe = create_recipe(
+                    author, name=f'Рецепт {n}.{m}', tags=tags[:2],
+                    ingredients=[(ingredient, 10)
+                                 for ingredient in ingredients])
+                cls.recipes.append(recipe)
+                recipe.favorites.add(cls.viewer)
+                ShoppingCart.objects.create(user=cls.viewer, recipe=recipe)
+
+    def setUp(self):
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def get(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def test_anonymous_endpoints(self):
+        recipe = self.recipes[0]
+        for url in ('/api/recipes/?limit=6',
+                    '/api/recipes/?limit=6&tags=tag-0',
+                    f'/api/recipes/{recipe.id}/',
+                    f'/api/users/{recipe.author_id}/',
+                    '/api/sync/'):
+            with self.subTest(url=url):
+                self.get(self.anonymous, url)
+
+    def test_authenticated_endpoints(self):
+        for url in ('/api/recipes/?limit=6',
+                    '/api/recipes/?limit=6&is_favorited=1',
+                    '/api/recipes/?limit=6&is_in_shopping_cart=1',
+                    f'/api/recipes/{self.recipes[0].id}/',
+                    '/api/users/subscriptions/?limit=8',
+                    '/api/recipes/download_shopping_cart/?format=txt'):
+            with self.subTest(url=url):
+                self.get(self.client, url)
+
+    def test_subscriptions_recipes_limit(self):
+        response = self.get(
+            self.client, '/api/users/subscriptions/?limit=8&recipes_limit=2')
+        for author in response.data['results']:
+            count = Recipe.objects.filter(author_id=author['id']).count()
+            self.assertEqual(author['recipes_count'], count)
+            self.assertEqual(len(author['recipes']), min(count, 2))
+            ids = [recipe['id'] for recipe in author['recipes']]
+            self.assertEqual(ids, sorted(ids))
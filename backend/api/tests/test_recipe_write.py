@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from .utils import (create_ingredients, create_recipe, create_tags,
+                    create_user, png_data_url, token_client)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+INGREDIENT_COUNT = 30
+TAG_COUNT = 4
+# Токен, по запросу на теги и ингредиенты, запись, id избранного,
+# корзины и подписок для ответа; у изменения ещё чтение рецепта
+# и текущих связей
+CREATE_QUERIES = 13
+UPDATE_QUERIES = 17
+
+
+def does_not_exist(pk):
+    """Сообщение стандартного PrimaryKeyRelatedField о неизвестном id."""
+    return PrimaryKeyRelatedField.default_error_messages[
+        'does_not_exist'].format(pk_value=pk)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeWriteTests(TestCase):
+    """Запись рецепта: число запросов не зависит от числа связей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.image = png_data_url()
+        cls.author = create_user('author')
+        cls.tags = create_tags(TAG_COUNT)
+        cls.ingredients = create_ingredients(INGREDIENT_COUNT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = token_client(self.author)
+
+    def payload(self, ingredients=None, tags=None):
+        if ingredients is None:
+            ingredients = [ingredient.id for ingredient in self.ingredients]
+        if tags is None:
+            tags = [tag.id for tag in self.tags]
+        return {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': self.image,
+            'tags': tags,
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id in ingredients
+            ],
+        }
+
+    def test_create_query_count(self):
+        for count in (3, INGREDIENT_COUNT):
+            ingredients = [
+                ingredient.id for ingredient in self.ingredients[:count]]
+            with self.subTest(ingredients=count):
+                with self.assertNumQueries(CREATE_QUERIES):
+                    response = self.client.post(
+                        '/api/recipes/',
+                        self.payload(ingredients=ingredients),
+                        format='json')
+                self.assertEqual(response.status_code, 201, response.data)
+                self.assertEqual(len(response.data['ingredients']), count)
+                self.assertEqual(len(response.data['tags']), TAG_COUNT)
+
+    def test_update_query_count(self):
+        recipe = create_recipe(
+            self.author, tags=self.tags[:2],
+            ingredients=[(ingredient, 5) for ingredient in
+                         self.ingredients[:INGREDIENT_COUNT // 2]])
+        with self.assertNumQueries(UPDATE_QUERIES):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.id}/', self.payload(), format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data['ingredients']), INGREDIENT_COUNT)
+
+    def test_unknown_ingredient(self):
+        ingredients = [self.ingredients[0].id, 999999]
+        response = self.client.post(
+            '/api/recipes/', self.payload(ingredients=ingredients),
+            format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['ingredients'],
+                         [{}, {'id': [does_not_exist(999999)]}])
+
+    def test_unknown_tag(self):
+        tags = [self.tags[0].id, 999999]
+        response = self.client.post(
+            '/api/recipes/', self.payload(tags=tags), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['tags'], [does_not_exist(999999)])
@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from api.models import SnapshotTask
+from api.pagination import CustomPagination
+from api.snapshots import detail_path, list_path, publish_pending
+
+from .utils import create_recipe, create_tags, create_user
+
+
+def tag_query(slug):
+    return f'page=1&limit={CustomPagination.page_size}&tags={slug}'
+
+
+class SnapshotQueueTests(TestCase):
+    """Изменения попадают в очередь и публикуются командой, не запросом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.tag = create_tags(1)[0]
+        cls.recipe = create_recipe(author, name='Первый', tags=[cls.tag])
+        cls.other = create_recipe(author, name='Второй', tags=[cls.tag])
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        # Не на весь класс: пакет из setUpTestData жил бы до конца тестов
+        snapshots = override_settings(
+            SNAPSHOTS_ENABLED=True, MEDIA_ROOT=media_root,
+            SNAPSHOT_HOST='testserver', SNAPSHOT_SECURE=False)
+        snapshots.enable()
+        self.addCleanup(snapshots.disable)
+
+    def test_commit_queues_one_task(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Переименован'
+            self.recipe.save()
+            self.recipe.tags.set([])
+        task = SnapshotTask.objects.get()
+        self.assertEqual(task.recipe_ids, [self.recipe.id])
+        self.assertEqual(task.tag_ids, [self.tag.id])
+        # Запрос пользователя снимки не рисует
+        self.assertFalse(detail_path(self.recipe.id).exists())
+
+        self.assertEqual(publish_pending(), 1)
+        self.assertFalse(SnapshotTask.objects.exists())
+        self.assertIn('Переименован',
+                      detail_path(self.recipe.id).read_text())
+
+    def test_rollback_discards_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.recipe.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            with transaction.atomic():
+                self.other.save()
+        self.assertEqual(SnapshotTask.objects.get().recipe_ids,
+                         [self.other.id])
+
+    def test_tag_rename_removes_old_lists(self):
+        old_slug = self.tag.slug
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save()
+        publish_pending()
+        self.assertTrue(list_path(tag_query(old_slug)).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.slug = 'renamed'
+            self.tag.save()
+        self.assertEqual(sorted(SnapshotTask.objects.get().tag_slugs),
+                         sorted([old_slug, 'renamed']))
+        publish_pending()
+        self.assertFalse(list_path(tag_query(old_slug)).exists())
+        self.assertTrue(list_path(tag_query('renamed')).exists())
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.models import ChangeLog
+
+from .utils import create_recipe, create_tags, create_user
+
+
+class SyncFeedTests(TestCase):
+    """Лента изменений /api/sync/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.tag = create_tags(1)[0]
+        cls.recipes = [
+            create_recipe(author, name=f'Рецепт {n}', tags=[cls.tag])
+            for n in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def log(self, *recipes, age=60):
+        entries = ChangeLog.objects.bulk_create([
+            ChangeLog(kind=ChangeLog.RECIPE, object_id=recipe.id,
+                      action=ChangeLog.UPSERT)
+            for recipe in recipes
+        ])
+        ChangeLog.objects.filter(pk__in=[entry.pk for entry in entries]
+                                 ).update(created=timezone.now()
+                                          - timedelta(seconds=age))
+        return entries
+
+    def sync(self, cursor=0):
+        response = self.client.get(f'/api/sync/?cursor={cursor}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_fresh_entries_are_held_back(self):
+        settled = self.log(*self.recipes[:2])
+        self.log(self.recipes[2], age=0)
+        data = self.sync()
+        self.assertEqual(data['cursor'], settled[-1].pk)
+        self.assertFalse(data['has_more'])
+        self.assertEqual(
+            [recipe['id'] for recipe in data['recipes']['upserted']],
+            [recipe.id for recipe in self.recipes[:2]])
+
+    def test_cursor_stops_before_fresh_entry(self):
+        # Меньший id ещё свежий: следующую запись нельзя отдать
+        self.log(self.recipes[0], age=0)
+        self.log(self.recipes[1])
+        data = self.sync()
+        self.assertEqual(data['cursor'], 0)
+        self.assertEqual(data['recipes']['upserted'], [])
+
+    def test_tag_change_logs_recipes_once(self):
+        # Один SELECT рецептов на событие: UPDATE тега, id рецептов,
+        # UPDATE их даты изменения и старый слаг для снимков
+        with override_settings(SNAPSHOTS_ENABLED=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertNumQueries(4):
+                    self.tag.name = 'Новое имя'
+                    self.tag.save()
+        self.assertCountEqual(
+            ChangeLog.objects.filter(kind=ChangeLog.RECIPE).values_list(
+                'object_id', flat=True),
+            [recipe.id for recipe in self.recipes])
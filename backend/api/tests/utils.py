@@ -0,0 +1,59 @@
+import base64
+import io
+
+from django.contrib.auth import get_user_model
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+def create_user(name):
+    return User.objects.create_user(
+        username=name, email=f'{name}@example.com', password='password',
+        first_name=name, last_name=name)
+
+
+def create_recipe(author, name='Рецепт', tags=(), ingredients=()):
+    """Рецепт с тегами и парами (ингредиент, количество)."""
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Описание', cooking_time=10,
+        image='recipes/images/test.png')
+    recipe.tags.set(tags)
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in ingredients
+    ])
+    return recipe
+
+
+def create_tags(count):
+    return Tag.objects.bulk_create([
+        Tag(name=f'Тег {n}', slug=f'tag-{n}') for n in range(count)
+    ])
+
+
+def create_ingredients(count):
+    return Ingredient.objects.bulk_create([
+        Ingredient(name=f'Ингредиент {n}', measurement_unit='г')
+        for n in range(count)
+    ])
+
+
+def token_client(user):
+    """Клиент с токеном, как у фронтенда."""
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def png_data_url():
+    """Картинка 1×1 в base64, как её отправляет фронтенд."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import RecipeViewSet, IngredientViewSet, TagViewSet, UserViewSet
+from .views import (
+    RecipeViewSet, IngredientViewSet, SyncViewSet, TagViewSet, UserViewSet)
 
 
 router = DefaultRouter()
@@ -9,6 +10,7 @@ router.register('recipes', RecipeViewSet, 'recipe')
 router.register('tags', TagViewSet, 'tag')
 router.register('ingredients', IngredientViewSet, 'ingredient')
 router.register('users', UserViewSet, 'user')
+router.register('sync', SyncViewSet, 'sync')
 
 
 urlpatterns = [
@@ -5,14 +5,15 @@ import csv
 from io import BytesIO
 from django.http import HttpResponse
 from django.core.files.base import ContentFile
-from django.db.models import Sum, IntegerField
+from django.db.models import Exists, IntegerField, OuterRef, Sum
 from django.db.models.functions import Cast
 from reportlab.pdfgen import canvas
 from rest_framework import status
 from rest_framework.response import Response
 
-from recipes.models import RecipeIngredient
+from recipes.models import Recipe, RecipeIngredient
 from carts.models import ShoppingCart
+from users.models import Follow
 
 
 def decode_base64_image(data, folder_name):
@@ -27,23 +28,130 @@ def decode_base64_image(data, folder_name):
         raise ValueError('Некорректный формат изображения') from e
 
 
-def process_ingredients(recipe, ingredients_data):
+def is_personal(request):
     """
-    Обрабатывает ингредиенты для рецепта:
-    - Удаляет старые связи.
-    - Создает новые записи через bulk_create.
+    Нужны ли в ответе персональные поля пользователя.
+    Параметр personal=false отключает их, и ответ становится общим.
     """
-    RecipeIngredient.objects.filter(recipe=recipe).delete()
+    if request is None:
+        return True
+    personal = request.query_params.get('personal', '')
+    return personal.lower() not in ('false', '0')
+
+
+def parse_list_param(request, name):
+    """Множество непустых значений из параметра name=a,b,c или None."""
+    if request is None:
+        return None
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def get_sparse_fields(request):
+    """
+    Разбирает параметры fields и expand. Возвращает пару (fields, expand),
+    где None означает «все». id выводится всегда. Если задан только
+    fields, связи выводятся идентификаторами, пока их не раскрыли в expand.
+    """
+    fields = parse_list_param(request, 'fields')
+    expand = parse_list_param(request, 'expand')
+    if fields is not None:
+        fields.add('id')
+        if expand is None:
+            expand = set()
+    return fields, expand
+
+
+MEMBERSHIP_QUERIES = {
+    'favorites': lambda user: Recipe.favorites.through.objects.filter(
+        user=user).values_list('recipe_id', flat=True),
+    'shopping_cart': lambda user: ShoppingCart.objects.filter(
+        user=user).values_list('recipe_id', flat=True),
+    'subscriptions': lambda user: Follow.objects.filter(
+        user=user).values_list('author_id', flat=True),
+}
+
+
+def get_membership(user):
+    """Отсортированные id избранного, корзины и подписок пользователя."""
+    return {
+        name: sorted(query(user))
+        for name, query in MEMBERSHIP_QUERIES.items()
+    }
+
+
+def get_viewer_ids(request, name):
+    """
+    Возвращает id из списка name (см. MEMBERSHIP_QUERIES) текущего
+    пользователя. Множество вычисляется одним запросом и кешируется
+    в запросе, поэтому флаги вроде is_subscribed стоят не больше одного
+    запроса на ответ.
+    """
+    if request is None or not request.user.is_authenticated:
+        return frozenset()
+    cache = request.__dict__.setdefault('_viewer_ids', {})
+    if name not in cache:
+        cache[name] = frozenset(MEMBERSHIP_QUERIES[name](request.user))
+    return cache[name]
+
+
+def process_ingredients(recipe, ingredients_data, existing=None):
+    """
+    Синхронизирует ингредиенты рецепта с переданными данными:
+    - Удаляет одним запросом связи, которых больше нет в данных.
+    - Добавляет новые и обновляет изменившиеся количества одним upsert
+      по ограничению unique_recipe_ingredient.
+    Возвращает актуальный список ингредиентов рецепта.
+    """
+    if existing is None:
+        existing = dict(
+            RecipeIngredient.objects.filter(recipe=recipe).annotate(
+                amount_numeric=Cast('amount', IntegerField())
+            ).values_list('ingredient_id', 'amount_numeric')
+        )
 
     recipe_ingredients = [
         RecipeIngredient(
             recipe=recipe,
-            ingredient=ingredient_data['id'],
+            ingredient=ingredient_data['ingredient'],
             amount=ingredient_data['amount']
         )
         for ingredient_data in ingredients_data
     ]
-    RecipeIngredient.objects.bulk_create(recipe_ingredients)
+
+    stale_ids = existing.keys() - {
+        item.ingredient_id for item in recipe_ingredients}
+    if stale_ids:
+        RecipeIngredient.objects.filter(
+            recipe=recipe, ingredient_id__in=stale_ids).delete()
+
+    changed = [
+        item for item in recipe_ingredients
+        if item.ingredient_id not in existing
+        or existing[item.ingredient_id] != item.amount
+    ]
+    if changed:
+        RecipeIngredient.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=['recipe', 'ingredient'],
+            update_fields=['amount']
+        )
+    return recipe_ingredients
+
+
+def set_prefetched_objects(instance, related_name, objects):
+    """
+    Кладёт уже известные связанные объекты в кеш prefetch_related,
+    чтобы сериализатор не запрашивал их из базы повторно.
+    """
+    queryset = getattr(instance, related_name).all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    instance.__dict__.setdefault(
+        '_prefetched_objects_cache', {})[related_name] = queryset
 
 
 class ShoppingCartFileGenerator:
@@ -128,12 +236,65 @@ def generate_shopping_cart_report(user, file_format='txt'):
 def handle_add_remove_action(model,
                              data,
                              error_message,
-                             success_message):
-    """Обрабатывает добавление или удаление объекта в модель Many-to-Many."""
+                             success_message,
+                             error_key='errors'):
+    """
+    Добавляет объект в модель Many-to-Many:
+    - Повтор находит проверкой по уникальному ключу и отвечает 400.
+    - Вставляет bulk_create(ignore_conflicts=True): одновременный
+      запрос с тем же объектом не приводит к ошибке 500.
+    """
     if model.objects.filter(**data).exists():
-        return Response({'errors': error_message},
+        return Response({error_key: error_message},
                         status=status.HTTP_400_BAD_REQUEST)
-
-    model.objects.create(**data)
+    model.objects.bulk_create([model(**data)], ignore_conflicts=True)
     return Response(success_message,
                     status=status.HTTP_201_CREATED)
+
+
+def bulk_add_recipes(model, user, recipe_ids):
+    """
+    Добавляет пользователю пачку рецептов (корзина, избранное):
+    - Одним запросом проверяет, какие рецепты существуют и уже добавлены.
+    - Одним bulk_create(ignore_conflicts=True) добавляет остальные.
+    Возвращает статус по каждому id в порядке запроса.
+    """
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    found = dict(
+        Recipe.objects.filter(id__in=recipe_ids).annotate(
+            is_added=Exists(model.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+        ).values_list('id', 'is_added')
+    )
+    model.objects.bulk_create(
+        [model(user=user, recipe_id=recipe_id)
+         for recipe_id, is_added in found.items() if not is_added],
+        ignore_conflicts=True
+    )
+    return [
+        {'id': recipe_id,
+         'status': ('not_found' if recipe_id not in found
+                    else 'exists' if found[recipe_id] else 'added')}
+        for recipe_id in recipe_ids
+    ]
+
+
+def bulk_remove_recipes(model, user, recipe_ids=None):
+    """
+    Удаляет у пользователя пачку рецептов (или все, если id не переданы)
+    одним DELETE ... IN. Возвращает статус по каждому id.
+    """
+    queryset = model.objects.filter(user=user)
+    if recipe_ids is not None:
+        recipe_ids = list(dict.fromkeys(recipe_ids))
+        queryset = queryset.filter(recipe_id__in=recipe_ids)
+    present = set(queryset.values_list('recipe_id', flat=True))
+    if present:
+        model.objects.filter(user=user, recipe_id__in=present).delete()
+    if recipe_ids is None:
+        recipe_ids = sorted(present)
+    return [
+        {'id': recipe_id,
+         'status': 'removed' if recipe_id in present else 'not_found'}
+        for recipe_id in recipe_ids
+    ]
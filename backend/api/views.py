@@ -1,8 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Prefetch
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from rest_framework import viewsets, mixins, status, filters
 from rest_framework.response import Response
 from rest_framework.permissions import (IsAuthenticated,
                                         AllowAny,
+                                        IsAdminUser,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.decorators import action
 from djoser.serializers import (
@@ -10,10 +18,12 @@ from djoser.serializers import (
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .filters import RecipeFilter, IngredientFilter
-from recipes.models import Recipe, Ingredient, Tag
+from recipes.models import (
+    ChangeLog, Recipe, Ingredient, RecipeIngredient, Tag)
 from users.models import User, Follow
 from carts.models import ShoppingCart
 from .serializers import (ListRetrieveRecipeSerializer,
+                          FastRecipeSerializer,
                           CreateUpdateDeleteRecipeSerializer,
                           ShoppingCartSerializer,
                           IngredientSerializer,
@@ -22,25 +32,102 @@ from .serializers import (ListRetrieveRecipeSerializer,
                           UserSerializer,
                           UserCreateSerializer,
                           SubscribeAuthorSerializer,
-                          FavoriteSerializer)
+                          FavoriteSerializer,
+                          RecipeIdsSerializer,
+                          SyncQuerySerializer,
+                          ExportQuerySerializer)
+from .cache import (
+    INGREDIENTS,
+    RECIPES,
+    TAGS,
+    USERS,
+    AnonymousCacheMixin)
+from .conditional import (
+    ConditionalGetMixin,
+    first_row,
+    get_viewer,
+    make_etag,
+    recipe_validator_rows,
+    recipe_validators,
+    user_validator_rows,
+    validator_row)
+from .export import export_recipes
+from .multiget import MultiGetMixin
 from .pagination import CustomPagination
 from .permissions import IsRecipeAuthor
+from .queries import query_budget
+from .renderers import FileFormatNegotiation
 from .utils import (
+    bulk_add_recipes,
+    bulk_remove_recipes,
     decode_base64_image,
     generate_shopping_cart_report,
-    handle_add_remove_action)
+    get_membership,
+    get_sparse_fields,
+    handle_add_remove_action,
+    is_personal)
 from shortener.views import create_short_link
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
+class RecipeViewSet(ConditionalGetMixin,
+                    AnonymousCacheMixin,
+                    MultiGetMixin,
+                    viewsets.ModelViewSet):
+    queryset = Recipe.objects.order_by('id')
+    cache_tags = (RECIPES, TAGS, INGREDIENTS, USERS)
+    user_filters = ('is_favorited', 'is_in_shopping_cart')
+    surrogate_keys = ('recipes',)
     pagination_class = CustomPagination
     permission_classes = (IsAuthenticatedOrReadOnly, IsRecipeAuthor,)
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
 
+    # Колонки рецепта, которые не читаются, если их нет в ?fields=
+    sparse_columns = ('name', 'image', 'text', 'cooking_time')
+    # Список и страница, уже прочитанные в get_validators
+    validated_list = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ['list', 'retrieve']:
+            return queryset
+        fields, expand = get_sparse_fields(self.request)
+        if fields is not None:
+            queryset = queryset.only('id', 'author', *(
+                name for name in self.sparse_columns if name in fields))
+        if not settings.FAST_RECIPE_SERIALIZER:
+            queryset = self.prefetch_fields(queryset, fields, expand)
+        return queryset
+
+    @staticmethod
+    def prefetch_fields(queryset, fields, expand):
+        """Подгружает только связи, которые попадут в ответ."""
+        def wanted(name):
+            return fields is None or name in fields
+
+        def expanded(name):
+            return expand is None or name in expand
+
+        if wanted('author') and expanded('author'):
+            queryset = queryset.select_related('author')
+        if wanted('tags'):
+            tags = Tag.objects.order_by('id')
+            if not expanded('tags'):
+                tags = tags.only('id')
+            queryset = queryset.prefetch_related(Prefetch('tags', tags))
+        if wanted('ingredients'):
+            recipe_ingredients = RecipeIngredient.objects.order_by('id')
+            if expanded('ingredients'):
+                recipe_ingredients = recipe_ingredients.select_related(
+                    'ingredient')
+            queryset = queryset.prefetch_related(
+                Prefetch('recipe_ingredients', recipe_ingredients))
+        return queryset
+
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
+            if settings.FAST_RECIPE_SERIALIZER:
+                return FastRecipeSerializer
             return ListRetrieveRecipeSerializer
         return CreateUpdateDeleteRecipeSerializer
 
@@ -48,10 +135,87 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # Разрешаем всем доступ на чтение, только автору — редактирование
         if self.action in ['update', 'partial_update', 'destroy']:
             self.permission_classes = [IsRecipeAuthor]
+        elif self.action == 'export':
+            self.permission_classes = [IsAdminUser]
         else:
             self.permission_classes = [IsAuthenticatedOrReadOnly]
         return super().get_permissions()
 
+    def get_validators(self, request, *args, **kwargs):
+        viewer = get_viewer(request, is_personal(request))
+        if self.action == 'retrieve':
+            row = first_row(recipe_validator_rows(
+                self.filter_queryset(self.get_queryset()), viewer).filter(
+                pk=kwargs['pk']))
+            if row is None:
+                return None
+            # Персональные флаги меняются без изменения рецепта
+            last_modified = None if viewer else row[1]
+            return make_etag([row], viewer), last_modified
+
+        # Страница читается один раз: валидаторы — аннотации к ней,
+        # а обработчик списка потом берёт её же (см. validated_list)
+        validators = recipe_validators(viewer)
+        queryset = self.filter_queryset(self.get_queryset()).annotate(
+            **validators)
+        page = self.paginate_queryset(queryset)
+        self.validated_list = (queryset, page)
+        if page is None:
+            # Порядок ?ids= задаёт порядок ответа, поэтому учитываем адрес
+            return make_etag([request.get_full_path(), *(
+                validator_row(recipe, validators) for recipe in queryset
+            )], viewer), None
+        return make_etag([
+            request.get_full_path(), self.paginator.page.paginator.count,
+            *(validator_row(recipe, validators) for recipe in page)
+        ], viewer), None
+
+    def filter_queryset(self, queryset):
+        if self.validated_list is not None:
+            return self.validated_list[0]
+        return super().filter_queryset(queryset)
+
+    def paginate_queryset(self, queryset):
+        if (self.validated_list is not None
+                and queryset is self.validated_list[0]):
+            return self.validated_list[1]
+        return super().paginate_queryset(queryset)
+
+    @staticmethod
+    def recipe_surrogate_keys(recipe, with_ingredients=False):
+        """
+        Ключи объектов, данные которых попали в представление рецепта.
+        Связи без ?expand= выведены id и ключей не добавляют.
+        """
+        keys = [f'recipe-{recipe["id"]}']
+        if isinstance(recipe.get('author'), dict):
+            keys.append(f'author-{recipe["author"]["id"]}')
+        keys += [f'tag-{tag["id"]}' for tag in recipe.get('tags', ())
+                 if isinstance(tag, dict)]
+        if with_ingredients:
+            keys += [f'ingredient-{item["id"]}'
+                     for item in recipe.get('ingredients', ())
+                     if 'name' in item]
+        return keys
+
+    def get_surrogate_keys(self, data):
+        if self.action == 'retrieve':
+            return self.recipe_surrogate_keys(data, with_ingredients=True)
+        keys = super().get_surrogate_keys(data)
+        for recipe in data.get('results', data):
+            keys += self.recipe_surrogate_keys(recipe)
+        return list(dict.fromkeys(keys))
+
+    @query_budget(12)
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+    @query_budget(10)
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs)
+
     @action(detail=True, methods=['get'], url_path='get-link')
     def get_short_link(self, request, pk=None):
         recipe = self.get_object()
@@ -64,25 +228,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
             methods=['post', 'delete'],
             permission_classes=(IsAuthenticated,))
     def favorite(self, request, **kwargs):
-        recipe = get_object_or_404(Recipe, id=kwargs['pk'])
         user = request.user
 
         if request.method == 'POST':
-            if recipe.favorites.filter(id=user.id).exists():
-                return Response({'detail': 'Рецепт уже в избранном.'},
-                                status=status.HTTP_400_BAD_REQUEST)
-            recipe.favorites.add(user)
+            recipe = get_object_or_404(Recipe, id=kwargs['pk'])
             serializer = FavoriteSerializer(recipe,
                                             context={'request': request})
-
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return handle_add_remove_action(
+                model=Recipe.favorites.through,
+                data={'user': user, 'recipe': recipe},
+                error_message='Рецепт уже в избранном.',
+                success_message=serializer.data,
+                error_key='detail'
+            )
 
         if request.method == 'DELETE':
-            if not recipe.favorites.filter(id=user.id).exists():
-                return Response({'detail': 'Рецепта нет в избранном.'},
-                                status=status.HTTP_400_BAD_REQUEST)
-            recipe.favorites.remove(user)
-            return Response(status=status.HTTP_204_NO_CONTENT)
+            deleted, _ = Recipe.favorites.through.objects.filter(
+                user=user, recipe_id=kwargs['pk']).delete()
+            if deleted:
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(Recipe, id=kwargs['pk'])
+            return Response({'detail': 'Рецепта нет в избранном.'},
+                            status=status.HTTP_400_BAD_REQUEST)
 
     @action(
         detail=True,
@@ -91,9 +258,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def add_to_shopping_cart(self, request, **kwargs):
-        recipe = get_object_or_404(Recipe, id=kwargs['pk'])
-
         if request.method == 'POST':
+            recipe = get_object_or_404(Recipe, id=kwargs['pk'])
             serializer = ShoppingCartSerializer(
                 recipe, data=request.data,
                 context={'request': request}
@@ -107,18 +273,70 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
 
         if request.method == 'DELETE':
-            shopping_cart_item = ShoppingCart.objects.filter(
-                user=request.user, recipe=recipe).first()
-            if shopping_cart_item:
-                shopping_cart_item.delete()
+            deleted, _ = ShoppingCart.objects.filter(
+                user=request.user, recipe_id=kwargs['pk']).delete()
+            if deleted:
                 return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(Recipe, id=kwargs['pk'])
             return Response(
                 {'errors': 'Этот рецепт не найден в списке покупок.'},
                 status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='favorite',
+            permission_classes=(IsAuthenticated,))
+    def favorite_bulk(self, request):
+        return self._bulk_recipes_action(request, Recipe.favorites.through)
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='shopping_cart',
+            permission_classes=(IsAuthenticated,))
+    def shopping_cart_bulk(self, request):
+        return self._bulk_recipes_action(request, ShoppingCart)
+
+    @action(detail=False,
+            methods=['delete'],
+            url_path='shopping_cart/clear',
+            permission_classes=(IsAuthenticated,))
+    def clear_shopping_cart(self, request):
+        results = bulk_remove_recipes(ShoppingCart, request.user)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def _bulk_recipes_action(self, request, model):
+        """Пакетно добавляет или удаляет рецепты из списка пользователя."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            results = bulk_add_recipes(model, request.user, recipe_ids)
+        else:
+            results = bulk_remove_recipes(model, request.user, recipe_ids)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def export(self, request):
+        """
+        Весь каталог потоком в NDJSON, по рецепту в строке, для персонала.
+        after=<id> продолжает прерванную выгрузку со следующего рецепта.
+        """
+        params = ExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        response = StreamingHttpResponse(
+            export_recipes(request, params.validated_data['after'],
+                           settings.EXPORT_CHUNK_SIZE),
+            content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="recipes.ndjson"')
+        return response
+
     @action(detail=False,
             methods=['get'],
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            content_negotiation_class=FileFormatNegotiation)
+    @query_budget(4)
     def download_shopping_cart(self, request):
         file_format = request.query_params.get('format', 'txt')
         file_data, error = generate_shopping_cart_report(request.user,
@@ -133,10 +351,81 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return file_data
 
 
-class IngredientViewSet(mixins.RetrieveModelMixin,
+class SyncViewSet(viewsets.GenericViewSet):
+    """
+    Лента изменений для офлайн-клиентов: рецепты, теги и ингредиенты,
+    созданные, изменённые или удалённые после курсора. Клиент передаёт
+    cursor из предыдущего ответа, пока has_more истинно.
+    """
+    queryset = ChangeLog.objects.order_by('id')
+    permission_classes = (AllowAny,)
+    pagination_class = None
+    sources = (
+        ('recipes', ChangeLog.RECIPE, Recipe, FastRecipeSerializer),
+        ('tags', ChangeLog.TAG, Tag, TagSerializer),
+        ('ingredients', ChangeLog.INGREDIENT, Ingredient,
+         IngredientSerializer),
+    )
+
+    @query_budget(6)
+    def list(self, request):
+        params = SyncQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        cursor = params.validated_data['cursor']
+        limit = params.validated_data['limit']
+        entries = list(self.get_queryset().filter(id__gt=cursor).values_list(
+            'id', 'kind', 'object_id', 'action', 'created')[:limit + 1])
+        # Запись с меньшим id может ещё не быть зафиксирована: страница
+        # обрывается на первой свежей записи, и курсор её не перескочит
+        settled = timezone.now() - timedelta(
+            seconds=settings.SYNC_SETTLE_SECONDS)
+        fresh = next((
+            index for index, entry in enumerate(entries)
+            if entry[4] > settled
+        ), None)
+        if fresh is not None:
+            entries = entries[:fresh]
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        # В пределах страницы важно только последнее действие с объектом
+        actions = {}
+        for _, kind, object_id, change, _ in entries:
+            actions[kind, object_id] = change
+
+        data = {
+            'cursor': entries[-1][0] if entries else cursor,
+            'has_more': has_more,
+        }
+        context = {**self.get_serializer_context(), 'personal': False}
+        for name, kind, model, serializer_class in self.sources:
+            changed = {
+                object_id: change
+                for (entry_kind, object_id), change in actions.items()
+                if entry_kind == kind
+            }
+            # Удалённый позже объект придёт удалением на следующих страницах
+            objects = model.objects.filter(pk__in=[
+                object_id for object_id, change in changed.items()
+                if change == ChangeLog.UPSERT
+            ]).order_by('pk')
+            data[name] = {
+                'upserted': serializer_class(
+                    objects, many=True, context=context).data,
+                'deleted': sorted(
+                    object_id for object_id, change in changed.items()
+                    if change == ChangeLog.DELETE),
+            }
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class IngredientViewSet(AnonymousCacheMixin,
+                        mixins.RetrieveModelMixin,
                         mixins.ListModelMixin,
                         viewsets.GenericViewSet):
     queryset = Ingredient.objects.all()
+    cache_tags = (INGREDIENTS,)
+    surrogate_keys = ('ingredients',)
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ['name']
     filterset_class = IngredientFilter
@@ -148,18 +437,24 @@ class IngredientViewSet(mixins.RetrieveModelMixin,
         return IngredientSerializer
 
 
-class TagViewSet(mixins.RetrieveModelMixin,
+class TagViewSet(AnonymousCacheMixin,
+                 mixins.RetrieveModelMixin,
                  mixins.ListModelMixin,
                  viewsets.GenericViewSet):
     queryset = Tag.objects.all()
+    cache_tags = (TAGS,)
+    surrogate_keys = ('tags',)
     serializer_class = TagSerializer
 
 
-class UserViewSet(mixins.CreateModelMixin,
+class UserViewSet(ConditionalGetMixin,
+                  MultiGetMixin,
+                  mixins.CreateModelMixin,
                   mixins.ListModelMixin,
                   mixins.RetrieveModelMixin,
                   viewsets.GenericViewSet):
-    queryset = User.objects.all()
+    # Стабильный порядок по первичному ключу для пагинации
+    queryset = User.objects.order_by('id')
     permission_classes = (AllowAny,)
     pagination_class = CustomPagination
 
@@ -168,6 +463,19 @@ class UserViewSet(mixins.CreateModelMixin,
             return UserSerializer
         return UserCreateSerializer
 
+    def get_validators(self, request, *args, **kwargs):
+        viewer = get_viewer(request)
+        row = first_row(user_validator_rows(
+            self.get_queryset().filter(pk=kwargs['pk']), viewer))
+        if row is None:
+            return None
+        return make_etag([row], viewer), None
+
+    @query_budget(6)
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs)
+
     @action(detail=False,
             methods=['get'],
             pagination_class=None,
@@ -178,6 +486,25 @@ class UserViewSet(mixins.CreateModelMixin,
         )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=False,
+            methods=['get'],
+            pagination_class=None,
+            permission_classes=(IsAuthenticated,),
+            url_path='me/membership')
+    def membership(self, request):
+        """
+        Id избранных рецептов, рецептов в корзине и авторов в подписках.
+        Вместе с personal=false позволяет брать общие страницы из кеша
+        и накладывать персональные флаги на клиенте.
+        """
+        data = get_membership(request.user)
+        etag = make_etag(data.items(), request.user)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(data, status=status.HTTP_200_OK)
+        response.headers['ETag'] = etag
+        return response
+
     @action(detail=False,
             methods=['post'],
             permission_classes=(IsAuthenticated,))
@@ -235,9 +562,8 @@ class UserViewSet(mixins.CreateModelMixin,
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=(IsAuthenticated,))
     def subscribe(self, request, **kwargs):
-        author = get_object_or_404(User, id=kwargs['pk'])
-
         if request.method == 'POST':
+            author = get_object_or_404(User, id=kwargs['pk'])
             serializer = SubscribeAuthorSerializer(
                 author, data=request.data, context={'request': request})
             if not serializer.is_valid(raise_exception=True):
@@ -253,19 +579,36 @@ class UserViewSet(mixins.CreateModelMixin,
             )
 
         elif request.method == 'DELETE':
-            subscription = Follow.objects.filter(
-                user=request.user, author=author).first()
-            if subscription:
-                subscription.delete()
+            deleted, _ = Follow.objects.filter(
+                user=request.user, author_id=kwargs['pk']).delete()
+            if deleted:
                 return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(User, id=kwargs['pk'])
             return Response({'detail': 'Вы не подписаны на этого автора'},
                             status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'],
             permission_classes=(IsAuthenticated,),
             pagination_class=CustomPagination)
+    @query_budget(6)
     def subscriptions(self, request):
-        queryset = User.objects.filter(follower__user=request.user)
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time', 'author_id'
+        ).order_by('id')
+        limit = request.query_params.get('recipes_limit', '')
+        if limit.isdigit():
+            recipes = recipes[:int(limit)]
+        # Рецепты всей страницы авторов одним запросом; срез Django
+        # применяет оконной функцией. Django 4.2.0 падает на срезе
+        # в Prefetch без to_attr, поэтому рецепты идут в атрибут
+        queryset = User.objects.filter(
+            follower__user=request.user
+        ).annotate(
+            recipes_count=Count('author_recipes', distinct=True)
+        ).prefetch_related(
+            Prefetch('author_recipes', queryset=recipes,
+                     to_attr='page_recipes')
+        ).order_by('id')
         page = self.paginate_queryset(queryset)
         serializer = SubscribeAuthorSerializer(page,
                                                many=True,
@@ -48,17 +48,23 @@ INSTALLED_APPS = [
     'carts.apps.CartsConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
-    'shortener.apps.ShortenerConfig'
+    'shortener.apps.ShortenerConfig',
+    'profiling.apps.ProfilingConfig',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.SqlCommentMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.QueryInspectorMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -96,6 +102,17 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -144,6 +161,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
     ),
@@ -165,3 +186,68 @@ DJOSER = {
 # Variable for models
 MAX_LENGTH_FOR_SHORT_VARIABLE = 50
 MAX_LENGTH_FOR_DESCRIPTION = 256
+
+# Response compression
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 4))
+
+# Read recipes through FastRecipeSerializer instead of ModelSerializer
+FAST_RECIPE_SERIALIZER = os.getenv('FAST_RECIPE_SERIALIZER', 'True') == 'True'
+
+# Anonymous API response cache
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', 300))
+
+# Cache-Control for shared responses and purging of the gateway/CDN cache
+API_CACHE_MAX_AGE = int(os.getenv('API_CACHE_MAX_AGE', 60))
+CACHE_PURGER = os.getenv('CACHE_PURGER', 'api.purgers.NullPurger')
+CACHE_PURGE_URL = os.getenv('CACHE_PURGE_URL', '')
+CACHE_PURGE_FILE = os.getenv('CACHE_PURGE_FILE',
+                             BASE_DIR / 'purged_keys.log')
+CACHE_PURGE_TIMEOUT = float(os.getenv('CACHE_PURGE_TIMEOUT', 2))
+
+# Variable for bulk API requests
+MAX_RECIPES_IN_BULK_REQUEST = 100
+
+# Maximum number of ids in a ?ids= multi-get request
+MAX_OBJECTS_IN_MULTI_GET = 100
+
+# Change feed for client synchronization: log entries per page
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 1000
+# Entries younger than this are held back: ids are taken before commit,
+# so a later id may become visible before an earlier one
+SYNC_SETTLE_SECONDS = float(os.getenv('SYNC_SETTLE_SECONDS', 5))
+
+# Pre-rendered JSON snapshots of anonymous recipe responses, served by nginx
+# from MEDIA_ROOT/snapshots/ before falling back to the backend
+SNAPSHOTS_ENABLED = os.getenv('SNAPSHOTS_ENABLED', 'False') == 'True'
+SNAPSHOT_HOST = os.getenv('SNAPSHOT_HOST', 'foodgram.shop')
+SNAPSHOT_SECURE = os.getenv('SNAPSHOT_SECURE', 'True') == 'True'
+SNAPSHOT_LIST_PAGES = int(os.getenv('SNAPSHOT_LIST_PAGES', 3))
+
+# Recipes per server-side cursor fetch in the NDJSON catalog export
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 500))
+
+# N+1 and query budget detector: warnings in development,
+# failures with QUERY_INSPECTOR_STRICT (tests, check_query_budgets)
+QUERY_INSPECTOR_ENABLED = os.getenv(
+    'QUERY_INSPECTOR_ENABLED', str(DEBUG)) == 'True'
+QUERY_INSPECTOR_STRICT = os.getenv('QUERY_INSPECTOR_STRICT', 'False') == 'True'
+QUERY_REPEAT_THRESHOLD = int(os.getenv('QUERY_REPEAT_THRESHOLD', 5))
+
+# Prometheus metrics at /metrics: scraped with METRICS_TOKEN as a bearer
+# token or viewed by staff; Server-Timing response header for staff
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'True') == 'True'
+
+# sqlcommenter-style comments (route, viewset, action, request id)
+# appended to every SQL query run while handling a request
+SQL_COMMENTER_ENABLED = os.getenv('SQL_COMMENTER_ENABLED', 'True') == 'True'
+
+# On-demand cProfile and tracemalloc profiling of single requests
+# (X-Profile header or ?profile) for staff or with PROFILING_TOKEN
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'True') == 'True'
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILING_TOP = int(os.getenv('PROFILING_TOP', 40))
+PROFILING_TRACEBACK_FRAMES = int(os.getenv('PROFILING_TRACEBACK_FRAMES', 1))
@@ -19,6 +19,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from api.metrics import metrics_view
 from shortener.views import handle_short_link
 
 
@@ -26,6 +27,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('s/<str:short_code>/', handle_short_link, name='short-link'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,64 @@
+from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import RequestProfile
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ['created', 'method', 'path', 'status', 'duration',
+                    'queries', 'memory_peak', 'user', 'download_link']
+    list_filter = ['route', 'method']
+    search_fields = ['path', 'route']
+    fields = ['created', 'user', 'method', 'path', 'route', 'status',
+              'duration', 'queries', 'queries_duration', 'memory_peak',
+              'download_link', 'cpu_text', 'memory_text']
+    readonly_fields = fields
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'user').defer('stats', 'cpu_report', 'memory_report')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/',
+                 self.admin_site.admin_view(self.download),
+                 name='profiling_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download(self, request, pk):
+        """Статистика pstats файлом: для snakeviz или модуля pstats."""
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(
+            RequestProfile.objects.only('stats'), pk=pk)
+        response = HttpResponse(
+            bytes(profile.stats), content_type='application/octet-stream')
+        response.headers['Content-Disposition'] = (
+            f'attachment; filename="request-{pk}.prof"')
+        return response
+
+    def download_link(self, obj):
+        return format_html(
+            '<a href="{}">.prof</a>',
+            reverse('admin:profiling_requestprofile_download', args=[obj.pk]))
+    download_link.short_description = 'Статистика'
+
+    def cpu_text(self, obj):
+        return format_html('<pre>{}</pre>', obj.cpu_report)
+    cpu_text.short_description = 'Профиль CPU'
+
+    def memory_text(self, obj):
+        return format_html('<pre>{}</pre>', obj.memory_report)
+    memory_text.short_description = 'Память'
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
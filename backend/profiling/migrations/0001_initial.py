@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-19 09:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=2000, verbose_name='Адрес')),
+                ('route', models.CharField(max_length=200, verbose_name='Маршрут')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Статус ответа')),
+                ('duration', models.FloatField(verbose_name='Время, мс')),
+                ('queries', models.PositiveIntegerField(verbose_name='SQL-запросов')),
+                ('queries_duration', models.FloatField(verbose_name='Время SQL, мс')),
+                ('memory_peak', models.PositiveBigIntegerField(verbose_name='Пик памяти, байт')),
+                ('cpu_report', models.TextField(verbose_name='Профиль CPU')),
+                ('memory_report', models.TextField(verbose_name='Память')),
+                ('stats', models.BinaryField(verbose_name='Статистика pstats')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """
+    Профиль одного запроса, снятый по флагу X-Profile или ?profile:
+    дерево вызовов cProfile и пик памяти по tracemalloc. Статистика
+    pstats хранится целиком и скачивается из админки.
+    """
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Дата')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.SET_NULL,
+                             null=True, blank=True,
+                             related_name='request_profiles',
+                             verbose_name='Пользователь')
+    method = models.CharField(max_length=10, verbose_name='Метод')
+    path = models.CharField(max_length=2000, verbose_name='Адрес')
+    route = models.CharField(max_length=200, verbose_name='Маршрут')
+    status = models.PositiveSmallIntegerField(verbose_name='Статус ответа')
+    duration = models.FloatField(verbose_name='Время, мс')
+    queries = models.PositiveIntegerField(verbose_name='SQL-запросов')
+    queries_duration = models.FloatField(verbose_name='Время SQL, мс')
+    memory_peak = models.PositiveBigIntegerField(
+        verbose_name='Пик памяти, байт')
+    cpu_report = models.TextField(verbose_name='Профиль CPU')
+    memory_report = models.TextField(verbose_name='Память')
+    stats = models.BinaryField(verbose_name='Статистика pstats')
+
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ['-created']
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration:.0f} мс)'
@@ -0,0 +1,135 @@
+import cProfile
+import hmac
+import io
+import marshal
+import pstats
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.metrics import QueryTimer, route_name
+
+from .models import RequestProfile
+
+PROFILE_PARAM = 'profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+# cProfile и tracemalloc общие на процесс: профиль снимается один за раз
+lock = threading.Lock()
+memory_filters = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+)
+
+
+def profile_requested(request):
+    return PROFILE_HEADER in request.META or PROFILE_PARAM in request.GET
+
+
+def get_profiler(request):
+    """
+    Кто снимает профиль: (разрешено, пользователь). Разрешено
+    сотрудникам — по сессии или токену API — и по PROFILING_TOKEN
+    в заголовке X-Profile.
+    """
+    token = settings.PROFILING_TOKEN
+    if token and hmac.compare_digest(
+            request.META.get(PROFILE_HEADER, '').encode(), token.encode()):
+        return True, None
+    if request.user.is_staff:
+        return True, request.user
+    # DRF аутентифицирует по токену только во вьюхе, здесь проверяем сами
+    try:
+        user_auth = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False, None
+    if user_auth is None or not user_auth[0].is_staff:
+        return False, None
+    return True, user_auth[0]
+
+
+def profile_request(request, get_response, user):
+    if not lock.acquire(blocking=False):
+        response = get_response(request)
+        response.headers['X-Profile'] = 'busy'
+        return response
+    try:
+        response, profile = capture(request, get_response, user)
+    finally:
+        lock.release()
+    # Ответ с профилем не должен попасть в общий кеш
+    patch_cache_control(response, private=True, no_store=True)
+    response.headers['X-Profile'] = reverse(
+        'admin:profiling_requestprofile_change', args=[profile.pk])
+    return response
+
+
+def capture(request, get_response, user):
+    """
+    Выполняет запрос под cProfile и tracemalloc. Время в профиле
+    завышено накладными расходами профилировщиков; у потоковых ответов
+    профиль охватывает только подготовку ответа.
+    """
+    profiler = cProfile.Profile()
+    queries = QueryTimer()
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(settings.PROFILING_TRACEBACK_FRAMES)
+    else:
+        tracemalloc.reset_peak()
+    try:
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - started
+        memory_peak = tracemalloc.get_traced_memory()[1]
+        snapshot = tracemalloc.take_snapshot().filter_traces(memory_filters)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    # Тот же формат, что у Stats.dump_stats: открывается snakeviz и pstats
+    raw_stats = marshal.dumps(stats.stats)
+    stats.sort_stats('cumulative').print_stats(settings.PROFILING_TOP)
+    profile = RequestProfile.objects.create(
+        user=user,
+        method=request.method,
+        path=request.get_full_path()[:2000],
+        route=route_name(request),
+        status=response.status_code,
+        duration=duration * 1000,
+        queries=queries.count,
+        queries_duration=queries.duration * 1000,
+        memory_peak=memory_peak,
+        cpu_report=stream.getvalue(),
+        memory_report=memory_report(snapshot, memory_peak),
+        stats=raw_stats,
+    )
+    return response, profile
+
+
+def memory_report(snapshot, memory_peak):
+    """
+    Пик за запрос и крупнейшие места выделения памяти, не
+    освобождённой к концу запроса: разбивку на пике tracemalloc
+    не хранит.
+    """
+    lines = [f'Пик за запрос: {memory_peak / 1024:.1f} KiB',
+             'Не освобождено к концу запроса:']
+    lines += [
+        str(stat) for stat in snapshot.statistics('lineno')[
+            :settings.PROFILING_TOP]
+    ]
+    return '\n'.join(lines)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import (
-    Recipe, Tag, Ingredient, RecipeIngredient, RecipeTag, Favorite)
+    ChangeLog, Recipe, Tag, Ingredient, RecipeIngredient, RecipeTag, Favorite)
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -55,9 +55,16 @@ class RecipeAdmin(admin.ModelAdmin):
     favorite_count.short_description = 'Число добавлений в избранное'
 
 
+class ChangeLogAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'object_id', 'action', 'created']
+    list_filter = ['kind', 'action']
+    search_fields = ['object_id']
+
+
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(RecipeTag, TagInRecipeAdmin)
 admin.site.register(RecipeIngredient, IngredientInRecipeAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
+admin.site.register(ChangeLog, ChangeLogAdmin)
@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ChangeLog, Recipe
+
+
+def log_changes(kind, object_ids, action=ChangeLog.UPSERT):
+    """
+    Записывает изменения в журнал после фиксации транзакции, чтобы
+    курсоры клиентов не перескакивали через ещё не видимые записи.
+    """
+    object_ids = list(dict.fromkeys(object_ids))
+    if not object_ids:
+        return
+    transaction.on_commit(lambda: ChangeLog.objects.bulk_create([
+        ChangeLog(kind=kind, object_id=object_id, action=action)
+        for object_id in object_ids
+    ], batch_size=1000))
+
+
+def touch_recipes(recipe_ids):
+    """
+    Обновляет дату изменения рецептов одним UPDATE и отмечает их
+    в журнале изменений.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated=timezone.now())
+    log_changes(ChangeLog.RECIPE, recipe_ids)
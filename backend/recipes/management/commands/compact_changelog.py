@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from recipes.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = ('Удаляет из журнала изменений записи, у которых есть более '
+            'поздняя запись о том же объекте. Курсоры клиентов остаются '
+            'корректными: последнее действие с объектом сохраняется.')
+
+    def handle(self, *args, **options):
+        deleted, _ = ChangeLog.objects.filter(Exists(
+            ChangeLog.objects.filter(
+                kind=OuterRef('kind'),
+                object_id=OuterRef('object_id'),
+                id__gt=OuterRef('id'))
+        )).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено устаревших записей: {deleted}'))
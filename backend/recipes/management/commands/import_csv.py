@@ -1,27 +1,159 @@
 import csv
+import json
+from collections import Counter
+from itertools import islice
+from pathlib import Path
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from recipes.models import Ingredient
+from api.cache import INGREDIENTS, RECIPES, invalidate
+from recipes.changelog import log_changes
+from recipes.models import ChangeLog, Ingredient
 
-TABLES = {
-    Ingredient: 'ingredients.csv'
+DEFAULT_PATH = Path(settings.BASE_DIR) / 'data' / 'ingredients.csv'
+
+
+def to_row(item):
+    if not isinstance(item, dict):
+        return None
+    return [item.get('name'), item.get('measurement_unit')]
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        yield row if len(row) == 2 else None
+
+
+def read_ndjson(file):
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            yield to_row(json.loads(line))
+        except json.JSONDecodeError:
+            yield None
+
+
+def read_json_array(file, chunk_size=65536):
+    """
+    Читает JSON-массив объектов по одному элементу, не загружая
+    файл целиком.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON-файл должен содержать массив.')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise CommandError('JSON-файл оборван или повреждён.')
+            buffer += chunk
+            continue
+        yield to_row(item)
+        buffer = buffer[end:]
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json_array,
+    '.ndjson': read_ndjson,
+    '.jsonl': read_ndjson,
 }
 
 
+def read_ingredients(path):
+    """
+    Пары (название, единица измерения) из файла по одной, None для
+    некорректных строк. Формат определяется по расширению.
+    """
+    reader = READERS.get(path.suffix.lower())
+    if reader is None:
+        raise CommandError(f'Неизвестный формат файла {path}.')
+    with open(path, encoding='utf-8') as file:
+        for row in reader(file):
+            if row is None or not all(
+                    isinstance(value, str) and value.strip()
+                    for value in row):
+                yield None
+            else:
+                yield tuple(value.strip() for value in row)
+
+
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
-        with open(
-            f'{settings.BASE_DIR}/data/ingredients.csv',
-            'r',
-            encoding='utf-8'
-        ) as file:
-            reader = csv.reader(file)
-            objects = []
-            for row in reader:
-                name, measurement_unit = row
-                obj = Ingredient(name=name, measurement_unit=measurement_unit)
-                objects.append(obj)
-            Ingredient.objects.bulk_create(objects, batch_size=500)
-        self.stdout.write(self.style.SUCCESS('Данные загружены'))
+    help = ('Загружает ингредиенты из CSV, JSON или NDJSON. Повторный '
+            'запуск безопасен: существующие пары название + единица '
+            'измерения не дублируются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', type=Path,
+                            default=[DEFAULT_PATH],
+                            help='Файлы .csv, .json, .ndjson или .jsonl, '
+                                 'по умолчанию data/ingredients.csv.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Строк в одной транзакции.')
+
+    def handle(self, *args, **options):
+        counts = Counter()
+        for path in options['paths']:
+            if not path.is_file():
+                raise CommandError(f'Файл {path} не найден.')
+            rows = read_ingredients(path)
+            seen = set()
+            while batch := list(islice(rows, options['batch_size'])):
+                counts += self.load_batch(batch, seen)
+        if counts['inserted']:
+            invalidate(INGREDIENTS, RECIPES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиенты загружены: добавлено {counts["inserted"]}, '
+            f'уже были {counts["existing"]}, '
+            f'пропущено {counts["skipped"]}'))
+
+    @transaction.atomic
+    def load_batch(self, batch, seen):
+        """
+        Добавляет новые пары одним INSERT. Уже существующие находятся
+        одним запросом и не трогаются: кроме ключа у ингредиента нет
+        полей, которые можно было бы обновить.
+        """
+        counts = Counter()
+        keys = []
+        for row in batch:
+            if row is None or row in seen:
+                counts['skipped'] += 1
+                continue
+            seen.add(row)
+            keys.append(row)
+        if not keys:
+            return counts
+
+        existing = set(Ingredient.objects.filter(
+            name__in={name for name, _ in keys}
+        ).values_list('name', 'measurement_unit')) & set(keys)
+        new = [key for key in keys if key not in existing]
+        if new:
+            new_keys = set(new)
+            # ignore_conflicts защищает от параллельного запуска загрузчика
+            Ingredient.objects.bulk_create([
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in new
+            ], ignore_conflicts=True)
+            # bulk_create не отправляет сигналы, отмечаем изменения сами
+            log_changes(ChangeLog.INGREDIENT, [
+                ingredient_id
+                for ingredient_id, name, unit in Ingredient.objects.filter(
+                    name__in={name for name, _ in new}
+                ).values_list('id', 'name', 'measurement_unit')
+                if (name, unit) in new_keys
+            ])
+        counts['existing'] += len(existing)
+        counts['inserted'] += len(new)
+        return counts
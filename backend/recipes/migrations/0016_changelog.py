@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+def seed_changelog(apps, schema_editor):
+    """Заносит существующие объекты в журнал, чтобы курсор 0 давал всё."""
+    ChangeLog = apps.get_model('recipes', 'ChangeLog')
+    for kind, model_name in (('tag', 'Tag'),
+                             ('ingredient', 'Ingredient'),
+                             ('recipe', 'Recipe')):
+        model = apps.get_model('recipes', model_name)
+        ChangeLog.objects.bulk_create((
+            ChangeLog(kind=kind, object_id=object_id, action='upsert')
+            for object_id in model.objects.order_by('pk').values_list(
+                'pk', flat=True).iterator()
+        ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_created_recipe_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('recipe', 'Рецепт'), ('tag', 'Тег'), ('ingredient', 'Ингредиент')], max_length=16, verbose_name='Тип объекта')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Id объекта')),
+                ('action', models.CharField(choices=[('upsert', 'Создание или изменение'), ('delete', 'Удаление')], max_length=16, verbose_name='Действие')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата записи')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Журнал изменений',
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='changelog_object_idx')],
+            },
+        ),
+        migrations.RunPython(seed_changelog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+from django.db.models import Count, Min
+from django.utils import timezone
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """
+    Сводит повторы (name, measurement_unit) к ингредиенту с меньшим id,
+    переназначая на него ингредиенты рецептов. Затронутые рецепты
+    получают новую дату изменения, как при правке через сигналы,
+    а изменения попадают в журнал синхронизации.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ChangeLog = apps.get_model('recipes', 'ChangeLog')
+    duplicates = (
+        Ingredient.objects.values('name', 'measurement_unit')
+        .annotate(count=Count('id'), keep_id=Min('id'))
+        .filter(count__gt=1)
+    )
+    recipe_ids = set()
+    changes = []
+    for group in duplicates:
+        keep_id = group['keep_id']
+        extra_ids = Ingredient.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit'],
+        ).exclude(id=keep_id).values_list('id', flat=True)
+        for extra_id in list(extra_ids):
+            rows = RecipeIngredient.objects.filter(ingredient_id=extra_id)
+            recipe_ids.update(rows.values_list('recipe_id', flat=True))
+            # Рецепт уже содержит оставляемый ингредиент: повтор лишний
+            rows.filter(
+                recipe__recipe_ingredients__ingredient_id=keep_id).delete()
+            rows.update(ingredient_id=keep_id)
+            Ingredient.objects.filter(id=extra_id).delete()
+            changes.append(('ingredient', extra_id, 'delete'))
+    # Без новой даты изменения ETag и Last-Modified рецепта прежние,
+    # и клиенты получили бы 304 со старым составом
+    Recipe.objects.filter(id__in=recipe_ids).update(updated=timezone.now())
+    changes += [('recipe', recipe_id, 'upsert')
+                for recipe_id in sorted(recipe_ids)]
+    ChangeLog.objects.bulk_create([
+        ChangeLog(kind=kind, object_id=object_id, action=action)
+        for kind, object_id, action in changes
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_changelog'),
+    ]
+
+    # Ограничение добавляет следующая миграция: в одной транзакции
+    # с удалением строк PostgreSQL не даст изменить таблицу, пока
+    # не проверены отложенные внешние ключи
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+    ]
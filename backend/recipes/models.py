@@ -39,6 +39,12 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            )
+        ]
 
 
 class Recipe(models.Model):
@@ -70,6 +76,10 @@ class Recipe(models.Model):
         blank=True,
         verbose_name='Автор'
     )
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Дата создания')
+    updated = models.DateTimeField(auto_now=True, db_index=True,
+                                   verbose_name='Дата изменения')
 
     def __str__(self):
         return self.name
@@ -143,3 +153,45 @@ class RecipeTag(models.Model):
         verbose_name = 'Тег рецепта'
         verbose_name_plural = 'Теги рецепта'
         ordering = ['recipe', 'tag__name']
+
+
+class ChangeLog(models.Model):
+    """
+    Журнал изменений рецептов, тегов и ингредиентов для синхронизации
+    клиентов. Возрастающий id служит курсором, удаления остаются
+    в журнале как записи с действием delete.
+    """
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    KIND_CHOICES = [
+        (RECIPE, 'Рецепт'),
+        (TAG, 'Тег'),
+        (INGREDIENT, 'Ингредиент'),
+    ]
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (UPSERT, 'Создание или изменение'),
+        (DELETE, 'Удаление'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES,
+                            verbose_name='Тип объекта')
+    object_id = models.PositiveIntegerField(verbose_name='Id объекта')
+    action = models.CharField(max_length=16, choices=ACTION_CHOICES,
+                              verbose_name='Действие')
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Дата записи')
+
+    class Meta:
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = [
+            models.Index(fields=['kind', 'object_id'],
+                         name='changelog_object_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.id}: {self.action} {self.kind} {self.object_id}'